@@ -0,0 +1,73 @@
+from itertools import islice
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from api.models import RequestProfile
+from api.profiling import profile_path
+
+PREVIEW_STACKS = 20
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Админ-модель профилей запросов"""
+    list_display = (
+        'id',
+        'created_at',
+        'method',
+        'route',
+        'status_code',
+        'duration',
+        'samples',
+        'trigger',
+        'user',
+        'download'
+    )
+    list_filter = ('trigger', 'route', 'method')
+    search_fields = ('path',)
+    readonly_fields = (
+        'created_at', 'trigger', 'method', 'route', 'path', 'status_code',
+        'duration', 'samples', 'user', 'file', 'download', 'top_stacks'
+    )
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download_view),
+                 name='api_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        record = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, record):
+            raise PermissionDenied
+        try:
+            file = open(profile_path(record), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл профиля не найден.')
+        return FileResponse(file, as_attachment=True, filename=record.file)
+
+    @admin.display(description='Collapsed stacks')
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">скачать</a>',
+            reverse('admin:api_requestprofile_download', args=(obj.pk,))
+        )
+
+    @admin.display(description='Самые частые стеки')
+    def top_stacks(self, obj):
+        try:
+            with open(profile_path(obj)) as file:
+                lines = list(islice(file, PREVIEW_STACKS))
+        except FileNotFoundError:
+            return None
+        return format_html('<pre>{}</pre>', ''.join(lines))
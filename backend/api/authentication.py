@@ -0,0 +1,140 @@
+"""
+Авторизация по токену с кэшем пользователей.
+
+TokenAuthentication на каждый запрос делает выборку Token JOIN User.
+Здесь пользователь токена кэшируется в памяти процесса (LRU с TTL)
+и, если задан AUTH_TOKEN_SHARED_CACHE_TTL, в общем кэше Django.
+Удаление токена (выход djoser), смена пароля, деактивация и правка
+профиля удаляют записи и кладут в общий кэш метку отзыва со временем.
+Запись, закэшированная до метки, не используется ни одним процессом,
+поэтому отзыв не ждет истечения TTL. Массовое User.objects.update()
+сигналов не шлет, после него кэш сбрасывается вызовом forget_user().
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.fields.files import FieldFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LRUCache
+from api.metrics import registry
+from users.models import User
+
+SHARED_KEY = 'auth:token:{}'
+REVOKED_KEY = 'auth:token:revoked:{}'
+# Поля авторизации, прав и сериализаторов текущего пользователя (профиль,
+# аватар, счетчики). Пароль отложен и загружается при обращении;
+# неизмененные счетчики save() не пишет (users.models.CounterFieldsMixin).
+USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.name in {'id', 'email', 'username', 'first_name', 'last_name',
+                      'is_active', 'is_staff', 'is_superuser', 'avatar',
+                      'avatar_variants', 'recipes_count', 'followers_count',
+                      'following_count'}
+)
+
+token_cache = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE,
+                       ttl=settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def _hashed(template, key):
+    """В общем кэше ключ токена хранится только в виде хэша."""
+    return template.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def _db_value(user, name):
+    """Значение поля для from_db; у файла - имя, а не FieldFile."""
+    value = getattr(user, name)
+    return value.name if isinstance(value, FieldFile) else value
+
+
+def forget_token(key):
+    """
+    Сброс записей токена во всех процессах. Метка отзыва живет, пока
+    могут жить записи, закэшированные до нее.
+    """
+    token_cache.delete(key)
+    cache.set(
+        _hashed(REVOKED_KEY, key), time.time(),
+        max(settings.AUTH_TOKEN_CACHE_TTL, settings.AUTH_TOKEN_SHARED_CACHE_TTL)
+    )
+    if settings.AUTH_TOKEN_SHARED_CACHE_TTL:
+        cache.delete(_hashed(SHARED_KEY, key))
+
+
+def forget_user(user_id):
+    """Сброс кэша токенов пользователя, в том числе после update()."""
+    for key in Token.objects.filter(user_id=user_id).values_list(
+        'key', flat=True
+    ):
+        forget_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который в установившемся режиме не обращается
+    к БД. Каждый запрос получает свои экземпляры User и Token.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = self.cached(key)
+        if entry is None:
+            registry.increment('auth_token_cache', 'miss')
+            # Время до чтения из БД: отзыв во время чтения сильнее записи.
+            started = time.time()
+            user, token = super().authenticate_credentials(key)
+            self.remember(token, started)
+            return user, token
+        user_values, created = entry[:2]
+        user = User.from_db(User.objects.db, USER_FIELDS, user_values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        token = Token.from_db(Token.objects.db, ('key', 'user_id', 'created'),
+                              (key, user.pk, created))
+        token.user = user
+        return user, token
+
+    @staticmethod
+    def cached(key):
+        """
+        Запись токена из кэша процесса или общего кэша; запись старше
+        метки отзыва отбрасывается. Одно обращение к общему кэшу.
+        """
+        revoked_key = _hashed(REVOKED_KEY, key)
+        entry = token_cache.get(key)
+        if entry is not None:
+            result = 'local_hit'
+            revoked = cache.get(revoked_key)
+        elif settings.AUTH_TOKEN_SHARED_CACHE_TTL:
+            result = 'shared_hit'
+            shared_key = _hashed(SHARED_KEY, key)
+            values = cache.get_many([shared_key, revoked_key])
+            entry, revoked = values.get(shared_key), values.get(revoked_key)
+        if entry is None:
+            return None
+        if revoked is not None and revoked >= entry[2]:
+            token_cache.delete(key)
+            return None
+        if result == 'shared_hit':
+            token_cache.set(key, entry)
+        registry.increment('auth_token_cache', result)
+        return entry
+
+    @staticmethod
+    def remember(token, cached_at):
+        entry = (
+            tuple(_db_value(token.user, name) for name in USER_FIELDS),
+            token.created,
+            cached_at,
+        )
+        token_cache.set(token.key, entry)
+        if settings.AUTH_TOKEN_SHARED_CACHE_TTL:
+            cache.set(_hashed(SHARED_KEY, token.key), entry,
+                      settings.AUTH_TOKEN_SHARED_CACHE_TTL)
@@ -0,0 +1,305 @@
+"""Бенчмарки горячих путей API на синтетическом наборе данных."""
+import csv
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.authentication import CachedTokenAuthentication
+from api.cache import bump_cart
+from api.filters import RecipeFilter
+from api.serializers import RecipeSerializer, SubscriptionSerializer
+from api.views import IngredientViewSet, RecipeViewSet
+from recipes.counters import recount_recipes, recount_users
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import index_recipes
+from recipes.shopping_list import rebuild as rebuild_shopping_lists
+from users.models import Subscription, User
+
+BATCH_SIZE = 2000
+PLACEHOLDER_IMAGE = 'rescipes/image/benchmark.png'
+FUZZY_QUERIES = 500
+
+
+def load_catalog():
+    """Загрузка полного справочника ингредиентов и тегов из csv."""
+    for model, file_name in ((Ingredient, 'ingredients.csv'),
+                             (Tag, 'tags.csv')):
+        path_to_file = os.path.join(settings.CSV_DIR, file_name)
+        with open(path_to_file, mode='r', encoding='utf-8') as csv_file:
+            model.objects.bulk_create(
+                (model(**row) for row in csv.DictReader(csv_file)),
+                batch_size=BATCH_SIZE
+            )
+
+
+def seed_dataset(users_count, recipes_count, seed=0):
+    """Заполнение пустой базы синтетическими данными."""
+    rnd = random.Random(seed)
+    load_catalog()
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    password = make_password('benchmark')
+    User.objects.bulk_create(
+        (User(username=f'user{i}', email=f'user{i}@example.com',
+              first_name='Имя', last_name='Фамилия', password=password)
+         for i in range(users_count)),
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+
+    Recipe.objects.bulk_create(
+        (Recipe(author_id=rnd.choice(user_ids), name=f'Рецепт {i}',
+                text='Описание рецепта', image=PLACEHOLDER_IMAGE,
+                cooking_time=rnd.randint(1, 180))
+         for i in range(recipes_count)),
+        batch_size=BATCH_SIZE
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    RecipeTag = Recipe.tags.through
+    RecipeTag.objects.bulk_create(
+        (RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in rnd.sample(tag_ids, rnd.randint(1, 3))),
+        batch_size=BATCH_SIZE
+    )
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=rnd.randint(1, 500))
+         for recipe_id in recipe_ids
+         for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 12))),
+        batch_size=BATCH_SIZE
+    )
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        index_recipes(recipe_ids[start:start + BATCH_SIZE])
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for user_id in user_ids
+             for recipe_id in rnd.sample(recipe_ids, rnd.randint(0, 10))),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+    Subscription.objects.bulk_create(
+        (Subscription(user_id=user_id, author_id=author_id)
+         for user_id in user_ids
+         for author_id in rnd.sample(user_ids, rnd.randint(0, 10))
+         if author_id != user_id),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        recount_recipes(recipe_ids[start:start + BATCH_SIZE])
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        recount_users(user_ids[start:start + BATCH_SIZE])
+        rebuild_shopping_lists(user_ids[start:start + BATCH_SIZE])
+
+
+def _consume(response):
+    """Полная отрисовка ответа, включая потоковый."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+class BenchmarkCases:
+    """Набор измеряемых сценариев на подготовленных данных."""
+    repeats = {
+        'ingredient_fuzzy_search': FUZZY_QUERIES,
+    }
+    budgets = {
+        'ingredient_fuzzy_search': ('p99_ms', 10.0),
+    }
+
+    def __init__(self):
+        self.factory = APIRequestFactory()
+        self.user = (
+            User.objects.filter(shopping_cart__isnull=False,
+                                following__isnull=False)
+            .order_by('id').first()
+        )
+        self.tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+
+    def request(self, path, params=None):
+        request = Request(self.factory.get(path, params))
+        request.user = self.user
+        return request
+
+    def recipe_serializer(self):
+        request = self.request('/api/recipes/')
+        recipes = Recipe.objects.with_user_flags(self.user)[:6]
+        return RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+
+    def subscription_serializer(self):
+        request = self.request('/api/users/subscriptions/',
+                               {'recipes_limit': 3})
+        authors = User.objects.filter(follower__user=self.user)[:6]
+        return SubscriptionSerializer(
+            authors, many=True, context={'request': request}
+        ).data
+
+    def recipe_filter(self, params):
+        def run():
+            request = self.request('/api/recipes/', params)
+            filterset = RecipeFilter(
+                data=request.query_params,
+                queryset=Recipe.objects.with_user_flags(self.user),
+                request=request
+            )
+            queryset = filterset.qs
+            return queryset.count(), list(queryset[:6])
+        return run
+
+    def ingredient_search(self, prefix):
+        view = IngredientViewSet.as_view({'get': 'list'})
+
+        def run():
+            request = self.factory.get('/api/ingredients/', {'name': prefix})
+            return _consume(view(request))
+        return run
+
+    def ingredient_fuzzy_search(self):
+        """Запросы с опечаткой по всему справочнику, по одному за вызов."""
+        view = IngredientViewSet.as_view({'get': 'list'})
+        rnd = random.Random(0)
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        queries = []
+        for name in rnd.sample(names, min(FUZZY_QUERIES, len(names))):
+            position = rnd.randrange(len(name))
+            queries.append(name[:position] + name[position + 1:] or name)
+        queries = itertools.cycle(queries)
+
+        def run():
+            request = self.factory.get(
+                '/api/ingredients/', {'name': next(queries), 'fuzzy': 1}
+            )
+            return _consume(view(request))
+        return run
+
+    def download_shopping_cart(self, format):
+        """Выгрузка без кэша: версия корзины сбрасывается перед вызовом."""
+        view = RecipeViewSet.as_view(
+            {'get': 'download_shopping_cart'},
+            **RecipeViewSet.download_shopping_cart.kwargs
+        )
+
+        def run():
+            bump_cart(self.user.pk)
+            request = self.factory.get(
+                '/api/recipes/download_shopping_cart/', {'format': format}
+            )
+            force_authenticate(request, self.user)
+            return _consume(view(request))
+        return run
+
+    def token_authentication(self, authentication_class):
+        """Проверка заголовка Authorization; кэш прогревает первый вызов."""
+        token, _ = Token.objects.get_or_create(user=self.user)
+        authentication = authentication_class()
+
+        def run():
+            request = Request(self.factory.get(
+                '/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}'
+            ))
+            return authentication.authenticate(request)
+        return run
+
+    def all(self):
+        return {
+            'recipe_serializer_page': self.recipe_serializer,
+            'subscription_serializer_page': self.subscription_serializer,
+            'recipe_filter_tags': self.recipe_filter(
+                {'tags': self.tags}),
+            'recipe_filter_author': self.recipe_filter(
+                {'author': [self.user.following.first().author_id]}),
+            'recipe_filter_favorited': self.recipe_filter(
+                {'is_favorited': '1'}),
+            'recipe_filter_cart_and_tags': self.recipe_filter(
+                {'is_in_shopping_cart': '1', 'tags': self.tags}),
+            'recipe_search': self.recipe_filter(
+                {'search': 'рецепт картофель'}),
+            'ingredient_search_one_letter': self.ingredient_search('м'),
+            'ingredient_search_prefix': self.ingredient_search('карто'),
+            'ingredient_fuzzy_search': self.ingredient_fuzzy_search(),
+            'download_shopping_cart': self.download_shopping_cart('txt'),
+            'download_shopping_cart_pdf': self.download_shopping_cart('pdf'),
+            'token_authentication': self.token_authentication(
+                TokenAuthentication),
+            'token_authentication_cached': self.token_authentication(
+                CachedTokenAuthentication),
+        }
+
+
+def measure(func, repeat):
+    """
+    Время (медиана и 99-й перцентиль, мс), число запросов
+    последнего прогона и пиковая память (КБ).
+    """
+    if repeat < 1:
+        raise ValueError(f'Число повторов должно быть не меньше 1: {repeat}')
+    func()
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings.sort()
+    return {
+        'wall_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99)], 3),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(result, baseline, threshold):
+    """Список регрессий результата относительно базовой линии."""
+    regressions = []
+    if baseline is None:
+        return regressions
+    if result['queries'] > baseline['queries']:
+        regressions.append(
+            f"queries {baseline['queries']} -> {result['queries']}")
+    for metric in ('wall_ms', 'peak_kb'):
+        limit = baseline[metric] * (1 + threshold)
+        if result[metric] > limit:
+            regressions.append(
+                f'{metric} {baseline[metric]} -> {result[metric]}')
+    return regressions
+
+
+def read_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def write_baseline(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(data, baseline_file, indent=2, sort_keys=True)
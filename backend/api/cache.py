@@ -0,0 +1,211 @@
+"""Кэширование ответов API с версионированием ключей."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from api.metrics import registry
+from recipes.catalog import get_catalog_version
+
+GLOBAL_VERSION_KEY = 'recipes:version:global'
+LIST_VERSION_KEY = 'recipes:version:list'
+RECIPE_VERSION_KEY = 'recipes:version:recipe:{}'
+CART_VERSION_KEY = 'recipes:version:cart:{}'
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса.
+    С ttl записи устаревают через ttl секунд после записи.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires, value = self._data[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = expires, value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+short_link_cache = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+
+
+def _new_version():
+    """
+    Начальная версия из текущего времени: если кэш вытеснил версию,
+    новая не совпадет ни с одной прежней и старые ответы не вернутся.
+    """
+    return time.time_ns()
+
+
+def get_version(key):
+    """Текущая версия ключа; версии хранятся без срока жизни."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Увеличение версии делает недоступными все ключи со старой."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def bump_recipe(recipe_id):
+    bump_version(RECIPE_VERSION_KEY.format(recipe_id))
+    bump_version(LIST_VERSION_KEY)
+
+
+def bump_cart(user_id):
+    bump_version(CART_VERSION_KEY.format(user_id))
+
+
+def bump_global():
+    bump_version(GLOBAL_VERSION_KEY)
+
+
+def response_cache_stats():
+    """Счетчики попаданий и промахов кэша ответов из реестра метрик."""
+    counts = registry.counter_totals('response_cache')
+    hits = counts.get('hit', 0)
+    misses = counts.get('miss', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def _normalized_query(request):
+    params = sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in request.query_params.lists()
+    )
+    return '&'.join(
+        f'{key}={",".join(values)}' for key, values in params if values
+    )
+
+
+def recipe_list_key(request):
+    query = hashlib.md5(
+        f'{request.build_absolute_uri("/")}?{_normalized_query(request)}'
+        .encode()
+    ).hexdigest()
+    return (f'recipes:list:{get_version(GLOBAL_VERSION_KEY)}:'
+            f'{get_version(LIST_VERSION_KEY)}:{query}')
+
+
+def recipe_detail_key(request, pk):
+    host = hashlib.md5(request.build_absolute_uri('/').encode()).hexdigest()
+    return (f'recipes:detail:{get_version(GLOBAL_VERSION_KEY)}:'
+            f'{get_version(RECIPE_VERSION_KEY.format(pk))}:{pk}:{host}')
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей.
+    Авторизованные запросы идут мимо кэша: в ответе есть личные флаги.
+    """
+
+    def cached_response(self, key_func, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = key_func()
+        data = cache.get(key)
+        if data is not None:
+            registry.increment('response_cache', 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        registry.increment('response_cache', 'miss')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPES_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: recipe_list_key(request),
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: recipe_detail_key(request, kwargs[self.lookup_field]),
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class CatalogConditionalMixin:
+    """
+    Условные GET-запросы к справочникам по версии из recipes.catalog:
+    при совпадении If-None-Match ответ 304 отдается без обращения к БД.
+    """
+    catalog = None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        token, modified = get_catalog_version(self.catalog)
+        etag = '"{}"'.format(hashlib.md5(
+            f'{token}:{request.get_full_path()}:'
+            f'{request.META.get("HTTP_ACCEPT", "")}'.encode()
+        ).hexdigest())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            response['Cache-Control'] = (
+                f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}'
+            )
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
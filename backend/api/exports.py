@@ -0,0 +1,143 @@
+"""Потоковая выгрузка списка покупок в TXT, CSV и PDF."""
+import csv
+import functools
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.cache import CART_VERSION_KEY, GLOBAL_VERSION_KEY, get_version
+from recipes.models import ShoppingListItem
+
+TITLE = 'Необходимо купить:'
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+CHUNK_ROWS = 200
+CHUNK_BYTES = 64 * 1024
+PDF_FONT_NAME = 'DejaVuSans'
+PDF_FALLBACK_FONT = 'Helvetica'
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 16
+
+
+def shopping_list_rows(user):
+    """Итоги списка покупок; читаются курсором частями."""
+    return ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount'
+    ).order_by('ingredient__name').iterator(chunk_size=CHUNK_ROWS)
+
+
+def render_txt(rows):
+    lines = [f'{TITLE}\n']
+    for name, unit, total in rows:
+        lines.append(f'{name} - {total} {unit}\n')
+        if len(lines) >= CHUNK_ROWS:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    lines = ['\ufeff' + writer.writerow(CSV_HEADER)]
+    for name, unit, total in rows:
+        lines.append(writer.writerow((name, total, unit)))
+        if len(lines) >= CHUNK_ROWS:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=None)
+def pdf_font():
+    """Шрифт с кириллицей регистрируется один раз на процесс."""
+    if not os.path.exists(settings.PDF_FONT_PATH):
+        return PDF_FALLBACK_FONT
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, settings.PDF_FONT_PATH))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    """
+    PDF рисуется постранично во временный файл,
+    который затем отдается частями.
+    """
+    font = pdf_font()
+    width, height = A4
+    with tempfile.SpooledTemporaryFile(max_size=CHUNK_BYTES * 16) as file:
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setTitle(TITLE)
+        y = height - PDF_MARGIN
+        pdf.setFont(font, 14)
+        pdf.drawString(PDF_MARGIN, y, TITLE)
+        y -= PDF_LINE_HEIGHT * 2
+        pdf.setFont(font, 11)
+        for name, unit, total in rows:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, 11)
+                y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, f'{name} - {total} {unit}')
+            y -= PDF_LINE_HEIGHT
+        pdf.save()
+        file.seek(0)
+        yield from iter(lambda: file.read(CHUNK_BYTES), b'')
+
+
+EXPORTERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+
+def shopping_list_key(user, format):
+    """
+    Выгрузка зависит от справочника ингредиентов и итогов пользователя,
+    но не от версии списка рецептов, которую меняет любая правка рецепта.
+    """
+    return (f'shopping:{user.pk}:{format}:'
+            f'{get_version(GLOBAL_VERSION_KEY)}:'
+            f'{get_version(CART_VERSION_KEY.format(user.pk))}')
+
+
+def _caching(key, chunks):
+    """Отдает части дальше и кладет результат в кэш, если он невелик."""
+    parts, size = [], 0
+    for chunk in chunks:
+        if parts is not None:
+            parts.append(chunk)
+            size += len(chunk)
+            if size > settings.SHOPPING_LIST_CACHE_MAX_BYTES:
+                parts = None
+        yield chunk
+    if parts is not None:
+        cache.set(key, b''.join(parts), settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def export_shopping_list(user, format):
+    """
+    Части файла выгрузки и признак попадания в кэш.
+    Ключ кэша меняется при изменении итогов пользователя
+    или справочника ингредиентов.
+    """
+    key = shopping_list_key(user, format)
+    content = cache.get(key)
+    if content is not None:
+        return iter((content,)), True
+    return _caching(key, EXPORTERS[format](shopping_list_rows(user))), False
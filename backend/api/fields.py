@@ -0,0 +1,52 @@
+import base64
+import binascii
+import io
+import uuid
+
+from django.core.files.base import ContentFile
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.constants import IMAGE_MAX_PIXELS
+from recipes.images import SOURCE_FORMATS
+
+IMAGE_MIME_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+
+class RawBase64ImageField(serializers.FileField):
+    """
+    Картинка в виде data URI. В запросе декодируется base64 и без
+    полного декодирования проверяется сама картинка (verify): формат
+    и размеры в пикселях. Уменьшенные копии создаются фоновой обработкой.
+    """
+    default_error_messages = {
+        'invalid': 'Картинка должна быть передана как data URI в base64.',
+        'format': 'Поддерживаются картинки JPEG, PNG, GIF и WebP.',
+        'pixels': 'Картинка больше {max_pixels} Мпикс.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data.startswith('data:'):
+            self.fail('invalid')
+        try:
+            mime_type, encoded = data[len('data:'):].split(';base64,', 1)
+        except ValueError:
+            self.fail('invalid')
+        if mime_type not in IMAGE_MIME_TYPES:
+            self.fail('format')
+        try:
+            content = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            self.fail('invalid')
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                image.verify()
+                extension = SOURCE_FORMATS[image.format]
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('pixels', max_pixels=IMAGE_MAX_PIXELS // 1000000)
+        except (KeyError, OSError, SyntaxError, ValueError):
+            self.fail('format')
+        if width * height > IMAGE_MAX_PIXELS:
+            self.fail('pixels', max_pixels=IMAGE_MAX_PIXELS // 1000000)
+        return ContentFile(content, name=f'{uuid.uuid4()}.{extension}')
@@ -1,20 +1,46 @@
-from django_filters.rest_framework import (AllValuesMultipleFilter,
-                                           BooleanFilter, FilterSet,
+from django_filters.rest_framework import (BooleanFilter, CharFilter,
+                                           FilterSet,
                                            ModelMultipleChoiceFilter)
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe
+from api.search import fuzzy_search_ingredients, ingredient_index
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 from users.models import User
 
 
 class IngredientFilter(SearchFilter):
+    """
+    Поиск ингредиентов по началу названия.
+    Список отдается из индекса в памяти, без запроса к БД.
+    С параметром fuzzy допускаются опечатки.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+    fuzzy_param = 'fuzzy'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_param))
+        except (TypeError, ValueError):
+            return None
+        return limit if limit > 0 else None
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip() or getattr(view, 'action', None) != 'list':
+            return super().filter_queryset(request, queryset, view)
+        if request.query_params.get(self.fuzzy_param) in ('1', 'true'):
+            return fuzzy_search_ingredients(query, self.get_limit(request))
+        return ingredient_index.prefix(query, self.get_limit(request))
 
 
 class RecipeFilter(FilterSet):
     """Фильтр для списка рецептов."""
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all()
     )
     author = ModelMultipleChoiceFilter(
         field_name='author__id',
@@ -27,6 +53,9 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = BooleanFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = CharFilter(
+        method='filter_search',
+    )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -38,11 +67,16 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности."""
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = [
             'author',
             'is_favorited',
             'is_in_shopping_cart',
-            'tags'
+            'tags',
+            'search'
         ]
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from api.benchmarks import (BenchmarkCases, compare, measure, read_baseline,
+                            seed_dataset, write_baseline)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Замер времени, числа запросов и памяти горячих путей API '
+            'на синтетических данных в отдельной тестовой базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимое ухудшение времени и памяти (доля).'
+        )
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Сохранить результаты как новую базовую линию.'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не пересоздавать тестовую базу между запусками.'
+        )
+        parser.add_argument('-k', dest='only', default='',
+                            help='Запускать только сценарии с подстрокой.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1.')
+        try:
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True,
+                serialize=False, keepdb=options['keepdb']
+            )
+        except OperationalError as error:
+            raise CommandError(
+                f'База {connection.vendor} недоступна: {error}'
+            )
+        try:
+            return self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                connection.settings_dict['NAME'],
+                verbosity=0, keepdb=options['keepdb']
+            )
+
+    def run(self, options):
+        vendor = connection.vendor
+        if not Recipe.objects.exists():
+            self.stdout.write(
+                f"Генерация данных ({vendor}): {options['users']} "
+                f"пользователей, {options['recipes']} рецептов"
+            )
+            seed_dataset(options['users'], options['recipes'],
+                         options['seed'])
+
+        baseline = read_baseline(options['baseline'])
+        vendor_baseline = baseline.setdefault(vendor, {})
+        failures = []
+        cases = BenchmarkCases()
+        for name, func in cases.all().items():
+            if options['only'] not in name:
+                continue
+            repeat = cases.repeats.get(name, options['repeat'])
+            if repeat < 1:
+                raise CommandError(
+                    f'{name}: число повторов должно быть не меньше 1.'
+                )
+            result = measure(func, repeat)
+            regressions = compare(
+                result, vendor_baseline.get(name), options['threshold']
+            )
+            if name in cases.budgets:
+                metric, budget = cases.budgets[name]
+                if result[metric] > budget:
+                    regressions.append(
+                        f'{metric} {result[metric]} > бюджет {budget}'
+                    )
+            status = 'REGRESSION' if regressions else 'ok'
+            self.stdout.write(
+                f"{name:<34} {result['wall_ms']:>10.2f} ms "
+                f"(p99 {result['p99_ms']:.2f}) "
+                f"{result['queries']:>4} queries "
+                f"{result['peak_kb']:>10.1f} KB  {status}"
+            )
+            if regressions:
+                failures.append(f"{name}: {', '.join(regressions)}")
+            if options['update_baseline'] or name not in vendor_baseline:
+                vendor_baseline[name] = result
+
+        write_baseline(options['baseline'], baseline)
+        if failures and not options['update_baseline']:
+            raise CommandError(
+                'Обнаружены регрессии:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Бенчмарки пройдены.'))
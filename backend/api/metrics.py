@@ -0,0 +1,294 @@
+"""
+Замеры времени обработки запросов по этапам.
+
+Для каждого запроса считаются время и число SQL-запросов, время
+сериализации, отрисовки ответа и общее время. Они отдаются заголовком
+Server-Timing и копятся в гистограммах по маршрутам.
+
+Каждый процесс копит гистограммы в памяти. Если задан METRICS_DIR,
+процесс периодически сбрасывает их в свой файл, а эндпоинт метрик
+суммирует файлы всех процессов. Каталог очищается при деплое.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGES = ('db', 'serialize', 'render')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Счетчики событий вне запросов: имя -> (метрика, описание, метка).
+COUNTERS = {
+    'response_cache': (
+        'foodgram_response_cache_total',
+        'Обращения к кэшу ответов для анонимных пользователей.',
+        'result',
+    ),
+    'auth_token_cache': (
+        'foodgram_auth_token_cache_total',
+        'Обращения к кэшу токенов авторизации.',
+        'result',
+    ),
+}
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Этапы одного запроса; вложенные замеры одного этапа не суммируются."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.queries = 0
+        self.active = set()
+
+    def add(self, name, elapsed):
+        self.stages[name] += elapsed
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: время и число запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+            self.queries += 1
+
+    def header(self, total):
+        """Значение Server-Timing; этапы могут пересекаться."""
+        return ', '.join([
+            f'db;dur={self.stages["db"] * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            *(f'{name};dur={self.stages[name] * 1000:.1f}'
+              for name in STAGES[1:]),
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Замер этапа текущего запроса; вне запроса ничего не делает."""
+    timings = _current.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def render_started():
+    """Начало отрисовки ответа; возвращает колбэк ее завершения."""
+    timings = _current.get()
+    if timings is None:
+        return None
+    started = time.perf_counter()
+
+    def finished(response):
+        timings.add('render', time.perf_counter() - started)
+    return finished
+
+
+class TimedRepresentationMixin:
+    """Время to_representation сериализатора попадает в этап serialize."""
+
+    def to_representation(self, instance):
+        with stage('serialize'):
+            return super().to_representation(instance)
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _labels(**labels):
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    ) + '}'
+
+
+class MetricsRegistry:
+    """
+    Гистограммы этапов и счетчики запросов процесса.
+    Ключи: (маршрут, метод, этап), (маршрут, метод, статус)
+    и (счетчик из COUNTERS, значение метки).
+    """
+
+    def __init__(self, directory=None, flush_interval=10.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self._queries = {}
+        self._counters = {}
+        self._flushed = time.monotonic()
+
+    def observe(self, route, method, status, timings, total):
+        values = dict(timings.stages, total=total)
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms.setdefault(
+                    (route, method, name), [0] * (len(BUCKETS) + 1) + [0.0]
+                )
+                for index, bound in enumerate(BUCKETS):
+                    if value <= bound:
+                        break
+                else:
+                    index = len(BUCKETS)
+                histogram[index] += 1
+                histogram[-1] += value
+            key = (route, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            key = (route, method)
+            self._queries[key] = self._queries.get(key, 0) + timings.queries
+            due = (self.directory and time.monotonic() - self._flushed
+                   >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def increment(self, name, label):
+        with self._lock:
+            key = (name, label)
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': [
+                    [*key, list(value)]
+                    for key, value in self._histograms.items()
+                ],
+                'requests': [[*key, value]
+                             for key, value in self._requests.items()],
+                'queries': [[*key, value]
+                            for key, value in self._queries.items()],
+                'counters': [[*key, value]
+                             for key, value in self._counters.items()],
+            }
+
+    def flush(self):
+        """Запись состояния процесса в его файл в общем каталоге."""
+        if not self.directory:
+            return
+        self._flushed = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Сумма состояний всех процессов; без каталога только этого."""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def counter_totals(self, name):
+        """Значения счетчика по меткам, сумма по всем процессам."""
+        totals = {}
+        for snapshot in self.collect():
+            for counter, label, value in snapshot.get('counters', ()):
+                if counter == name:
+                    totals[label] = totals.get(label, 0) + value
+        return totals
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        histograms, requests, queries, counters = {}, {}, {}, {}
+        for snapshot in self.collect():
+            for *key, value in snapshot['histograms']:
+                total = histograms.setdefault(
+                    tuple(key), [0] * (len(BUCKETS) + 1) + [0.0]
+                )
+                for index, count in enumerate(value):
+                    total[index] += count
+            for totals, name in ((requests, 'requests'),
+                                 (queries, 'queries'),
+                                 (counters, 'counters')):
+                for *key, value in snapshot.get(name, ()):
+                    totals[tuple(key)] = totals.get(tuple(key), 0) + value
+
+        lines = [
+            '# HELP foodgram_request_stage_seconds Время этапов обработки '
+            'запроса.',
+            '# TYPE foodgram_request_stage_seconds histogram',
+        ]
+        for (route, method, name), value in sorted(histograms.items()):
+            labels = dict(route=route, method=method, stage=name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), value):
+                cumulative += count
+                lines.append(
+                    'foodgram_request_stage_seconds_bucket'
+                    f'{_labels(**labels, le=bound)} {cumulative}'
+                )
+            lines.append(f'foodgram_request_stage_seconds_sum'
+                         f'{_labels(**labels)} {value[-1]:.6f}')
+            lines.append(f'foodgram_request_stage_seconds_count'
+                         f'{_labels(**labels)} {cumulative}')
+        lines += [
+            '# HELP foodgram_requests_total Число обработанных запросов.',
+            '# TYPE foodgram_requests_total counter',
+        ]
+        for (route, method, status), value in sorted(requests.items()):
+            lines.append(
+                'foodgram_requests_total'
+                f'{_labels(route=route, method=method, status=status)} '
+                f'{value}'
+            )
+        lines += [
+            '# HELP foodgram_db_queries_total Число SQL-запросов.',
+            '# TYPE foodgram_db_queries_total counter',
+        ]
+        for (route, method), value in sorted(queries.items()):
+            lines.append(
+                'foodgram_db_queries_total'
+                f'{_labels(route=route, method=method)} {value}'
+            )
+        for name, (metric, description, label) in COUNTERS.items():
+            lines += [
+                f'# HELP {metric} {description}',
+                f'# TYPE {metric} counter',
+            ]
+            for (counter, value), count in sorted(counters.items()):
+                if counter == name:
+                    lines.append(
+                        f'{metric}{_labels(**{label: value})} {count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(settings.METRICS_DIR,
+                           settings.METRICS_FLUSH_INTERVAL)
+atexit.register(registry.flush)
@@ -0,0 +1,92 @@
+import time
+
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from api.authentication import CachedTokenAuthentication
+from api.metrics import finish_request, registry, render_started, start_request
+from api.profiling import requested, sampler, save_profile
+
+
+def route_name(request):
+    """Имя маршрута: recipes-list для API, admin:index для остальных."""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    if match.namespace == 'api':
+        return match.url_name
+    return match.view_name
+
+
+class ServerTimingMiddleware:
+    """
+    Заголовок Server-Timing и гистограммы по маршрутам.
+    Стоит первым в MIDDLEWARE, чтобы total включал остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = start_request()
+        try:
+            with connection.execute_wrapper(timings.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            finish_request(token)
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.header(total)
+        registry.observe(route_name(request), request.method,
+                         response.status_code, timings, total)
+        return response
+
+    def process_template_response(self, request, response):
+        finished = render_started()
+        if finished is not None:
+            response.add_post_render_callback(finished)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профиль запроса по флагу персонала или для медленных запросов.
+    Без флага и PROFILE_SLOW_MS запрос проходит без изменений.
+    Стоит после AuthenticationMiddleware: флаг проверяется до выборки.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def is_staff(request):
+        """Персонал по сессии или по токену; токен берется из кэша."""
+        if request.user.is_staff:
+            return True
+        try:
+            result = CachedTokenAuthentication().authenticate(
+                Request(request)
+            )
+        except AuthenticationFailed:
+            return False
+        return result is not None and result[0].is_staff
+
+    def __call__(self, request):
+        manual = requested(request) and self.is_staff(request)
+        if not manual and sampler.threshold is None:
+            return self.get_response(request)
+        started = time.perf_counter()
+        if not (manual and sampler.begin()) and sampler.threshold:
+            sampler.watch()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = sampler.end()
+        if profile is None or not profile.samples:
+            return response
+        record = save_profile(profile, request, route_name(request),
+                              response.status_code,
+                              time.perf_counter() - started)
+        if manual:
+            response['X-Profile-Id'] = str(record.pk)
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создан')),
+                ('trigger', models.CharField(choices=[('manual', 'По запросу'), ('slow', 'Медленный запрос')], max_length=16, verbose_name='Причина')),
+                ('method', models.CharField(max_length=16, verbose_name='Метод')),
+                ('route', models.CharField(max_length=128, verbose_name='Маршрут')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Статус')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='Выборок')),
+                ('file', models.CharField(max_length=255, verbose_name='Файл')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль запроса API, снятый выборочным профилировщиком."""
+
+    class Trigger(models.TextChoices):
+        MANUAL = 'manual', 'По запросу'
+        SLOW = 'slow', 'Медленный запрос'
+
+    created_at = models.DateTimeField(
+        verbose_name='Создан',
+        auto_now_add=True,
+        db_index=True
+    )
+    trigger = models.CharField(
+        verbose_name='Причина',
+        max_length=16,
+        choices=Trigger.choices
+    )
+    method = models.CharField(verbose_name='Метод', max_length=16)
+    route = models.CharField(verbose_name='Маршрут', max_length=128)
+    path = models.TextField(verbose_name='Адрес')
+    status_code = models.PositiveSmallIntegerField(verbose_name='Статус')
+    duration = models.FloatField(verbose_name='Длительность, мс')
+    samples = models.PositiveIntegerField(verbose_name='Выборок')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    file = models.CharField(verbose_name='Файл', max_length=255)
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f'{self.method} {self.route}: {self.duration:.0f} мс'
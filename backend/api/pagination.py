@@ -1,7 +1,44 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Курсорная пагинация по убыванию id без COUNT и OFFSET."""
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 6
+    page_size = 6
 
 
 class PageLimitPagination(PageNumberPagination):
+    """
+    Постраничная пагинация; с параметром cursor или pagination=cursor
+    переключается на курсорную. Курсор строится по id, поэтому выдача
+    поиска, упорядоченная по релевантности, всегда постраничная.
+    """
     page_size_query_param = 'limit'
     max_page_size = 6
     page_size = 6
+    cursor_query_param = KeysetPagination.cursor_query_param
+    mode_query_param = 'pagination'
+    ranked_query_params = ('search',)
+    keyset = None
+
+    def use_keyset(self, request):
+        if any(request.query_params.get(name)
+               for name in self.ranked_query_params):
+            return False
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
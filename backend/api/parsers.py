@@ -0,0 +1,9 @@
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Тело запроса в формате NDJSON: по одному JSON-объекту в строке."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return (line for line in stream)
@@ -0,0 +1,199 @@
+"""
+Выборочный профилировщик запросов API.
+
+Фоновый поток раз в PROFILE_INTERVAL секунд снимает стек потока,
+обрабатывающего запрос, и считает одинаковые стеки. Профиль пишется
+в PROFILE_DIR в формате collapsed stacks (flamegraph.pl, speedscope)
+и попадает в админку как RequestProfile.
+
+Профиль снимается по флагу запроса (заголовок X-Profile: 1 или параметр
+?profile=1, только для персонала) либо для запросов дольше
+PROFILE_SLOW_MS: выборка начинается, когда запрос превысил порог.
+Без флага и порога поток не запускается и запросы не отслеживаются.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.models import RequestProfile
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+FLAG_VALUES = ('1', 'true', 'yes')
+
+
+def requested(request):
+    """Флаг профилирования в заголовке или параметре запроса."""
+    value = (request.META.get(PROFILE_HEADER)
+             or request.GET.get(PROFILE_PARAM))
+    return value is not None and value.lower() in FLAG_VALUES
+
+
+_names = {}
+
+
+def frame_name(frame):
+    """module:Class.function; имена кешируются по объекту кода."""
+    code = frame.f_code
+    name = _names.get(code)
+    if name is None:
+        module = frame.f_globals.get('__name__', '?')
+        name = _names[code] = (
+            f'{module}:{getattr(code, "co_qualname", code.co_name)}'
+        )
+    return name
+
+
+def collapse(frame):
+    """Стек от корня к вершине, кадры через точку с запятой."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profile:
+    """Число выборок каждого стека одного запроса."""
+
+    def __init__(self, thread_id, trigger):
+        self.thread_id = thread_id
+        self.trigger = trigger
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add(self, frame):
+        self.stacks[collapse(frame)] += 1
+        self.samples += 1
+
+    def lines(self):
+        return [f'{stack} {count}'
+                for stack, count in self.stacks.most_common()]
+
+
+class Sampler:
+    """
+    Фоновый поток выборки стеков.
+    Пока нет профилей, поток ждет на условии и просыпается только
+    к ближайшему порогу отслеживаемого запроса.
+    """
+
+    def __init__(self, interval, threshold=None, max_active=4):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_active = max_active
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._profiles = {}
+        self._watched = {}
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='request-profiler', daemon=True
+            )
+            self._thread.start()
+
+    def begin(self):
+        """Профиль текущего потока с этого момента; False при лимите."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            if len(self._profiles) >= self.max_active:
+                return False
+            self._profiles[thread_id] = Profile(
+                thread_id, RequestProfile.Trigger.MANUAL
+            )
+            self._ensure_thread()
+            self._wakeup.notify()
+        return True
+
+    def watch(self):
+        """Профиль текущего потока, если запрос превысит порог."""
+        deadline = time.monotonic() + self.threshold
+        with self._lock:
+            idle = not self._profiles and not self._watched
+            self._watched[threading.get_ident()] = deadline
+            self._ensure_thread()
+            if idle:
+                self._wakeup.notify()
+
+    def end(self):
+        """Завершение запроса; профиль потока, если он снимался."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._watched.pop(thread_id, None)
+            return self._profiles.pop(thread_id, None)
+
+    def _promote(self, now):
+        for thread_id, deadline in list(self._watched.items()):
+            if deadline > now or len(self._profiles) >= self.max_active:
+                continue
+            del self._watched[thread_id]
+            self._profiles[thread_id] = Profile(
+                thread_id, RequestProfile.Trigger.SLOW
+            )
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._promote(time.monotonic())
+                while not self._profiles:
+                    timeout = None
+                    if self._watched:
+                        timeout = max(
+                            min(self._watched.values()) - time.monotonic(), 0
+                        )
+                    self._wakeup.wait(timeout)
+                    self._promote(time.monotonic())
+            time.sleep(self.interval)
+            with self._lock:
+                frames = sys._current_frames()
+                for thread_id, profile in self._profiles.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        profile.add(frame)
+                del frames
+
+
+def save_profile(profile, request, route, status_code, duration):
+    """Файл профиля и запись для админки; старые профили удаляются."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = (f'{timezone.now():%Y%m%d-%H%M%S}-{route.replace(":", "-")}-'
+            f'{uuid.uuid4().hex[:8]}.folded')
+    with open(os.path.join(settings.PROFILE_DIR, name), 'w') as file:
+        file.write('\n'.join(profile.lines()) + '\n')
+    user = getattr(request, 'user', None)
+    record = RequestProfile.objects.create(
+        trigger=profile.trigger,
+        method=request.method,
+        route=route,
+        path=request.get_full_path(),
+        status_code=status_code,
+        duration=round(duration * 1000, 1),
+        samples=profile.samples,
+        user=user if user is not None and user.is_authenticated else None,
+        file=name,
+    )
+    stale = RequestProfile.objects.values_list('id', flat=True)[
+        settings.PROFILE_KEEP:
+    ]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
+    return record
+
+
+def profile_path(record):
+    return os.path.join(settings.PROFILE_DIR, record.file)
+
+
+sampler = Sampler(
+    settings.PROFILE_INTERVAL,
+    settings.PROFILE_SLOW_MS / 1000 if settings.PROFILE_SLOW_MS else None,
+    settings.PROFILE_MAX_ACTIVE,
+)
@@ -0,0 +1,53 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+
+class ExportRenderer(BaseRenderer):
+    """Рендерер файловой выгрузки; обычные ответы выводит как текст."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode('utf-8')
+
+
+class PlainTextRenderer(ExportRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ExportRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Формат выгрузки задается только параметром ?format=,
+    заголовок Accept не учитывается; по умолчанию первый рендерер.
+    Неизвестный формат - 406 со списком допустимых.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format = format_suffix or request.query_params.get(
+            api_settings.URL_FORMAT_OVERRIDE
+        )
+        for renderer in renderers:
+            if not format or renderer.format == format:
+                return renderer, renderer.media_type
+        formats = ', '.join(renderer.format for renderer in renderers)
+        raise NotAcceptable(
+            f'Неизвестный формат {format}; допустимые: {formats}.',
+            available_renderers=renderers
+        )
@@ -0,0 +1,130 @@
+"""Поиск по справочнику ингредиентов в памяти процесса."""
+import bisect
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import BooleanField, Case, Q, Value, When
+
+from recipes.catalog import INGREDIENTS, get_catalog_version
+from recipes.constants import FUZZY_SEARCH_LIMIT, FUZZY_SIMILARITY_THRESHOLD
+from recipes.models import Ingredient
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(value):
+    """Ключ сравнения: без учета регистра, ё приравнена к е."""
+    return ' '.join(value.casefold().replace('ё', 'е').split())
+
+
+def trigrams(value):
+    """Набор триграмм слов строки, как в pg_trgm."""
+    result = set()
+    for word in WORD_RE.findall(normalize(value)):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class IngredientIndex:
+    """
+    Отсортированный массив нормализованных названий ингредиентов.
+    Строится лениво и перестраивается при смене версии справочника.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = (None, [], [], [], {})
+
+    def _load(self):
+        version = get_catalog_version(INGREDIENTS)[0]
+        if self._state[0] == version:
+            return self._state
+        with self._lock:
+            if self._state[0] != version:
+                entries = sorted(
+                    (normalize(name), pk, name, unit)
+                    for pk, name, unit in Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    )
+                )
+                grams = [trigrams(entry[0]) for entry in entries]
+                postings = defaultdict(list)
+                for position, row_grams in enumerate(grams):
+                    for gram in row_grams:
+                        postings[gram].append(position)
+                self._state = (
+                    version,
+                    [entry[0] for entry in entries],
+                    [entry[1:] for entry in entries],
+                    [len(row_grams) for row_grams in grams],
+                    dict(postings),
+                )
+        return self._state
+
+    def fuzzy(self, query, limit=FUZZY_SEARCH_LIMIT):
+        """
+        Поиск с опечатками: сначала совпадения по началу названия,
+        затем по убыванию триграммного сходства.
+        """
+        _, keys, rows, sizes, postings = self._load()
+        key = normalize(query)
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(postings.get(gram, ()))
+        ranked = []
+        for position, common in shared.items():
+            similarity = common / (
+                len(query_grams) + sizes[position] - common
+            )
+            is_prefix = keys[position].startswith(key)
+            if is_prefix or similarity >= FUZZY_SIMILARITY_THRESHOLD:
+                ranked.append((not is_prefix, -similarity, keys[position],
+                               position))
+        ranked.sort()
+        return [
+            Ingredient(id=pk, name=name, measurement_unit=unit)
+            for pk, name, unit in (
+                rows[entry[3]] for entry in ranked[:limit]
+            )
+        ]
+
+    def prefix(self, query, limit=None):
+        """Ингредиенты с названием, начинающимся с query, по id."""
+        _, keys, rows, _, _ = self._load()
+        key = normalize(query)
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_right(keys, key + '\U0010ffff', lo=start)
+        found = sorted(rows[start:end])
+        if limit:
+            found = found[:limit]
+        return [
+            Ingredient(id=pk, name=name, measurement_unit=unit)
+            for pk, name, unit in found
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def fuzzy_search_ingredients(query, limit=FUZZY_SEARCH_LIMIT):
+    """Поиск с опечатками: pg_trgm на PostgreSQL, иначе индекс в памяти."""
+    limit = min(limit or FUZZY_SEARCH_LIMIT, FUZZY_SEARCH_LIMIT)
+    if connection.vendor != 'postgresql':
+        return ingredient_index.fuzzy(query, limit)
+    return list(
+        Ingredient.objects.annotate(
+            similarity=TrigramSimilarity('name', query),
+            is_prefix=Case(
+                When(name__istartswith=query, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).filter(
+            Q(name__trigram_similar=query) | Q(name__istartswith=query)
+        ).order_by('-is_prefix', '-similarity', 'name')[:limit]
+    )
@@ -1,21 +1,28 @@
 from django.contrib.auth import get_user_model
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.fields import RawBase64ImageField
+from api.metrics import TimedRepresentationMixin
 from api.validators import validate_tags
+from recipes.clicks import click_buffer
 from recipes.constants import MIN_AMOUNT_INGREDIENT
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            RecipeShortLink, ShoppingCart, Tag)
+from recipes.images import clear_variants, srcset, validate_image_size
+from recipes.jobs import enqueue
+from recipes.models import (Favorite, ImageJob, ImageStatus, Ingredient,
+                            Recipe, RecipeIngredient, RecipeShortLink,
+                            ShoppingCart, Tag)
+from recipes.shopping_list import apply_recipe_delta
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -26,67 +33,113 @@ class UserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_srcset'
         )
 
+    def get_avatar_srcset(self, obj):
+        return srcset(obj.avatar_variants, self.context.get('request'))
+
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         if not user or user.is_anonymous:
             return False
         return Subscription.objects.filter(user=user, author=obj).exists()
 
 
-class ShowFavoriteSerializer(serializers.ModelSerializer):
+class ShowFavoriteSerializer(TimedRepresentationMixin,
+                             serializers.ModelSerializer):
     """Сериализатор укороченной информации о рецепте."""
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_srcset', 'cooking_time']
         read_only_fields = ('__all__',)
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants, self.context.get('request'))
+
 
 class RecipeMixin:
     """Миксин для сериализаторов, работающих с рецептами."""
 
-    def get_recipes(self, obj):
-        """Функция выдачи рецептов автора с лимитом."""
+    def get_recipes_limit(self):
+        """Значение recipes_limit из запроса или None."""
         limit = self.context['request'].query_params.get('recipes_limit')
-        queryset = obj.recipes.all()
         try:
-            limit = int(limit) if limit and int(limit) > 0 else None
+            return int(limit) if limit and int(limit) > 0 else None
         except (ValueError, TypeError):
-            limit = None
-        if limit:
-            queryset = queryset[:limit]
+            return None
+
+    def get_recipes(self, obj):
+        """Функция выдачи рецептов автора с лимитом."""
+        if hasattr(obj, 'recipe_previews'):
+            queryset = obj.recipe_previews
+        else:
+            queryset = obj.recipes.all()
+            limit = self.get_recipes_limit()
+            if limit:
+                queryset = queryset[:limit]
         serializer = ShowFavoriteSerializer(queryset, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
-        """Функция расчета количества рецептов автора."""
-        return obj.recipes.count()
+        """Количество рецептов автора из счетчика пользователя."""
+        return obj.recipes_count
 
 
-class ShortLinkSerializer(serializers.ModelSerializer, RecipeMixin):
+class ShortLinkSerializer(TimedRepresentationMixin,
+                          serializers.ModelSerializer, RecipeMixin):
     """Сериализатор для короткой ссылки."""
 
     short_link = serializers.SerializerMethodField()
+    clicks = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeShortLink
-        fields = ('short_link',)
+        fields = ('short_link', 'clicks')
 
     def get_short_link(self, obj):
         """Создает полный URL для короткой ссылки."""
         return f"/s/{obj.short_link}"
 
+    def get_clicks(self, obj):
+        """Переходы из базы и еще не записанные переходы процесса."""
+        return obj.clicks + click_buffer.pending(obj.recipe_id)
+
     def to_representation(self, instance):
         """Преобразует ключи в формат с дефисом."""
         representation = super().to_representation(instance)
         return {
-            'short-link': representation['short_link']
+            'short-link': representation['short_link'],
+            'clicks': representation['clicks']
         }
 
 
-class SubscriptionSerializer(serializers.ModelSerializer, RecipeMixin):
+class SubscriptionListSerializer(TimedRepresentationMixin,
+                                 serializers.ListSerializer):
+    """
+    Страница подписок: рецепты всех авторов страницы загружаются
+    одним запросом вместо запроса на каждого автора.
+    """
+
+    def to_representation(self, data):
+        authors = list(data)
+        previews = {author.pk: [] for author in authors}
+        for recipe in Recipe.objects.previews(
+            previews, self.child.get_recipes_limit()
+        ):
+            previews[recipe.author_id].append(recipe)
+        for author in authors:
+            author.recipe_previews = previews[author.pk]
+        return super().to_representation(authors)
+
+
+class SubscriptionSerializer(TimedRepresentationMixin,
+                             serializers.ModelSerializer, RecipeMixin):
     """Сериализатор для подписок пользователя."""
 
     recipes = serializers.SerializerMethodField(read_only=True)
@@ -106,24 +159,36 @@ class SubscriptionSerializer(serializers.ModelSerializer, RecipeMixin):
             'recipes_count',
             'avatar'
         )
+        list_serializer_class = SubscriptionListSerializer
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return Subscription.objects.filter(user=user, author=obj).exists()
 
 
-class AvatarUserSerializer(serializers.ModelSerializer):
+class AvatarUserSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для добавления/удаления аватара."""
-    avatar = Base64ImageField(required=True)
+    avatar = RawBase64ImageField(required=True,
+                                 validators=[validate_image_size])
 
     class Meta:
         model = User
         fields = ('avatar',)
 
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        clear_variants(instance, 'avatar')
+        instance = super().update(instance, validated_data)
+        enqueue(ImageJob.Kind.AVATAR, [instance.pk])
+        return instance
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор модели Тегов."""
     class Meta:
         model = Tag
@@ -143,19 +208,21 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'amount', 'measurement_unit']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор модели Ингредиентов."""
     class Meta:
         model = Ingredient
         fields = ['id', 'name', 'measurement_unit']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор просмотра модели Рецепт."""
     tags = TagSerializer(many=True)
     author = UserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
     image = Base64ImageField(required=True)
+    image_srcset = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField(
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -172,16 +239,28 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
+            'image_status',
             'text',
             'cooking_time'
         ]
     read_only_fields = ('author', 'tags', 'ingredients')
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants, self.context.get('request'))
+
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
+        ingredients = obj.recipeingredient_set.all()
         return RecipeIngredientSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -190,6 +269,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -209,17 +290,18 @@ class AddIngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
-class CreateRecipeSerializer(serializers.ModelSerializer):
+class CreateRecipeSerializer(TimedRepresentationMixin,
+                             serializers.ModelSerializer):
     """Сериализатор создания/обновления рецепта."""
     author = UserSerializer(read_only=True)
     ingredients = AddIngredientRecipeSerializer(
         many=True, required=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
+    tags = serializers.ListField(
+        child=serializers.IntegerField()
     )
-    image = Base64ImageField(required=True)
+    image = RawBase64ImageField(required=True,
+                                validators=[validate_image_size])
 
     class Meta:
         model = Recipe
@@ -235,71 +317,112 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, data):
-        tags = self.initial_data.get('tags')
-        tags = validate_tags(tags)
-        ingredients = self.initial_data.get('ingredients')
+        data['tags'] = validate_tags(data.get('tags'))
+        ingredients = data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError({
                 'ingredients': 'Нужен хоть один ингридиент для рецепта'})
-        ingredient_list = []
-        for ingredient_item in ingredients:
-            try:
-                ingredient = get_object_or_404(Ingredient,
-                                               id=ingredient_item['id']
-                                               )
-            except Http404:
-                raise serializers.ValidationError({
-                    'ingredients': ('Убедитесь, что такой '
-                                    'ингредиент существует')
-                })
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError('Ингридиенты должны '
-                                                  'быть уникальными')
-            ingredient_list.append(ingredient)
-            if int(ingredient_item['amount']) < MIN_AMOUNT_INGREDIENT:
-                raise serializers.ValidationError({
-                    'ingredients': ('Убедитесь, что значение количества '
-                                    'ингредиента больше 0')
-                })
-        data['ingredients'] = ingredients
+        ingredient_ids = {item['id'] for item in ingredients}
+        if len(ingredient_ids) != len(ingredients):
+            raise serializers.ValidationError('Ингридиенты должны '
+                                              'быть уникальными')
+        if Ingredient.objects.filter(
+                id__in=ingredient_ids).count() != len(ingredient_ids):
+            raise serializers.ValidationError({
+                'ingredients': ('Убедитесь, что такой '
+                                'ингредиент существует')
+            })
+        if any(item['amount'] < MIN_AMOUNT_INGREDIENT
+               for item in ingredients):
+            raise serializers.ValidationError({
+                'ingredients': ('Убедитесь, что значение количества '
+                                'ингредиента больше 0')
+            })
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient_for_create in ingredients:
-            ingredient = Ingredient.objects.get(id=ingredient_for_create['id'])
-            RecipeIngredient.objects.create(
-                ingredient=ingredient,
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
                 recipe=recipe,
-                amount=ingredient_for_create['amount']
+                ingredient_id=item['id'],
+                amount=item['amount']
             )
+            for item in ingredients
+        )
 
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Изменяет только отличающиеся строки состава рецепта
+        и переносит разницу в итоги списков покупок.
+        """
+        current = {
+            link.ingredient_id: link
+            for link in recipe.recipeingredient_set.all()
+        }
+        before = {pk: link.amount for pk, link in current.items()}
+        wanted = {item['id']: item['amount'] for item in ingredients}
+        removed = current.keys() - wanted.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, link in current.items():
+            amount = wanted.get(ingredient_id)
+            if amount is not None and link.amount != amount:
+                link.amount = amount
+                changed.append(link)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [item for item in ingredients if item['id'] not in current],
+            recipe
+        )
+        apply_recipe_delta(recipe.pk, {
+            ingredient_id: wanted.get(ingredient_id, 0)
+            - before.get(ingredient_id, 0)
+            for ingredient_id in before.keys() | wanted.keys()
+        })
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта."""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags)
+        recipe = Recipe.objects.create(
+            author=author, image_status=ImageStatus.PROCESSING,
+            **validated_data
+        )
+        recipe.tags.add(*tags)
         self.create_ingredients(ingredients, recipe)
+        enqueue(ImageJob.Kind.RECIPE, [recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Изменение рецепта."""
-        instance.tags.clear()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        ingredients = validated_data.pop('ingredients', None)
-        self.create_ingredients(ingredients, instance)
-        instance.name = validated_data.pop('name')
-        instance.text = validated_data.pop('text')
-        if validated_data.get('image'):
-            instance.image = validated_data.pop('image')
-        instance.cooking_time = validated_data.pop('cooking_time')
+        instance.tags.set(validated_data.pop('tags'))
+        self.update_ingredients(validated_data.pop('ingredients'), instance)
+        image = validated_data.pop('image', None)
+        if image:
+            clear_variants(instance, 'image')
+            instance.image = image
+            instance.image_status = ImageStatus.PROCESSING
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         instance.save()
+        if image:
+            enqueue(ImageJob.Kind.RECIPE, [instance.pk])
         return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_user_flags(
+            request.user if request else None
+        ).get(pk=instance.pk)
         return RecipeSerializer(instance, context={
-            'request': self.context.get('request')
+            'request': request
         }).data
 
 
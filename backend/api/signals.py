@@ -0,0 +1,124 @@
+import os
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_token, forget_user
+from api.cache import (LIST_VERSION_KEY, bump_cart, bump_global, bump_recipe,
+                       bump_version, short_link_cache)
+from api.models import RequestProfile
+from api.profiling import profile_path
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            RecipeShortLink, ShoppingCart, Tag)
+from recipes.shopping_list import shopping_lists_changed
+from recipes.signals import catalog_loaded, recipes_imported
+from users.models import User
+
+AUTH_USER_FIELDS = {'password', 'is_active', 'is_staff', 'is_superuser'}
+AUTHOR_PROFILE_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants'
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    # После удаления Collector обнуляет pk, поэтому id берется сразу.
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: bump_recipe(recipe_id))
+
+
+@receiver(recipes_imported)
+def invalidate_recipe_lists(sender, **kwargs):
+    bump_version(LIST_VERSION_KEY)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_recipe(instance.recipe_id))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_list(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_cart(instance.user_id))
+
+
+@receiver(shopping_lists_changed)
+def invalidate_shopping_lists(sender, user_ids, **kwargs):
+    """Состав рецепта изменился в корзинах этих пользователей."""
+    def bump_carts():
+        for user_id in user_ids:
+            bump_cart(user_id)
+    transaction.on_commit(bump_carts)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        transaction.on_commit(bump_global)
+    else:
+        transaction.on_commit(lambda: bump_recipe(instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(bump_global)
+
+
+@receiver(catalog_loaded)
+def invalidate_loaded_catalog(sender, report, **kwargs):
+    """Переименованные теги попадают в кэшированные ответы с рецептами."""
+    if report.updated:
+        bump_global()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_profile(sender, instance, update_fields, **kwargs):
+    if update_fields and not AUTHOR_PROFILE_FIELDS & set(update_fields):
+        return
+    if instance.recipes.exists():
+        transaction.on_commit(bump_global)
+
+
+@receiver(post_delete, sender=RecipeShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    short_link_cache.delete(instance.short_link)
+
+
+@receiver(post_delete, sender=RequestProfile)
+def remove_profile_file(sender, instance, **kwargs):
+    try:
+        os.remove(profile_path(instance))
+    except FileNotFoundError:
+        pass
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    # key - первичный ключ токена, после удаления Collector его обнуляет.
+    key = instance.key
+    transaction.on_commit(lambda: forget_token(key))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, update_fields, **kwargs):
+    """
+    Смена пароля, деактивация и правка профиля сбрасывают кэш токена.
+    QuerySet.update() сигналов не шлет: после него нужен forget_user().
+    """
+    if created:
+        return
+    fields = AUTH_USER_FIELDS | AUTHOR_PROFILE_FIELDS
+    if update_fields and not fields & set(update_fields):
+        return
+    transaction.on_commit(lambda: forget_user(instance.pk))
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from recipes.counters import change_counter
+from users.models import User
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class CachedTokenAuthenticationTests(TestCase):
+    """Кэш пользователей токенов и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.authentication = CachedTokenAuthentication()
+        token_cache.delete(self.token.key)
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.token.key)
+
+    def test_cached_user_served_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_token_deleted_in_atomic_block_is_forgotten(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Token.objects.filter(pk=self.token.pk).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_token_revoked_in_other_process_is_rejected(self):
+        self.authenticate()
+        entry = token_cache.get(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(pk=self.token.pk).delete()
+        # Запись в памяти другого процесса переживает удаление токена.
+        token_cache.set(self.token.key, entry)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_profile_edit_recaches_user(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Новое'
+            self.user.save()
+        user, _ = self.authenticate()
+        self.assertEqual(user.first_name, 'Новое')
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_me_fields_cached_and_counters_not_written_back(self):
+        self.authenticate()
+        user, _ = self.authenticate()
+        self.assertEqual(user.get_deferred_fields(),
+                         {'password', 'last_login', 'date_joined'})
+        change_counter(User, self.user.pk, 'followers_count', 1)
+        user.first_name = 'Новое'
+        user.save()
+        self.assertEqual(
+            User.objects.get(pk=self.user.pk).followers_count, 1
+        )
@@ -0,0 +1,64 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import bump_recipe
+from api.exports import shopping_list_key
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import apply_recipe_delta
+from users.models import User
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class ShoppingListKeyTests(TestCase):
+    """Ключ выгрузки меняется только вместе с итогами пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='картофель', measurement_unit='г'
+        )
+        cls.in_cart = Recipe.objects.create(
+            author=cls.user, name='Пюре', text='Размять картофель',
+            cooking_time=30, image='recipes/images/puree.png'
+        )
+        cls.other = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Сварить суп',
+            cooking_time=30, image='recipes/images/soup.png'
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.in_cart, ingredient=cls.ingredient, amount=100
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.in_cart)
+
+    def test_unrelated_recipe_edit_keeps_key(self):
+        key = shopping_list_key(self.user, 'txt')
+        bump_recipe(self.other.pk)
+        self.assertEqual(shopping_list_key(self.user, 'txt'), key)
+
+    def test_recipe_in_cart_change_bumps_key(self):
+        key = shopping_list_key(self.user, 'txt')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_recipe_delta(self.in_cart.pk, {self.ingredient.pk: 50})
+        self.assertNotEqual(shopping_list_key(self.user, 'txt'), key)
+
+
+class ExportFormatTests(TestCase):
+    """Неизвестный формат выгрузки - ошибка клиента, а не 404."""
+
+    def test_unknown_format_lists_allowed(self):
+        user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/recipes/download_shopping_cart/',
+                              {'format': 'xls'})
+        self.assertEqual(response.status_code, 406)
+        self.assertIn(b'txt, csv, pdf', response.content)
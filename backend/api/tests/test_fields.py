@@ -0,0 +1,47 @@
+import base64
+import io
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import RawBase64ImageField
+from recipes.constants import IMAGE_MAX_PIXELS
+
+
+def data_uri(size, format='PNG', mime_type='image/png'):
+    buffer = io.BytesIO()
+    Image.new('1', size).save(buffer, format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:{mime_type};base64,{encoded}'
+
+
+class RawBase64ImageFieldTests(SimpleTestCase):
+    """Заголовок картинки проверяется при разборе запроса."""
+
+    def setUp(self):
+        self.field = RawBase64ImageField()
+
+    def test_small_image_accepted(self):
+        file = self.field.to_internal_value(data_uri((32, 32)))
+        self.assertTrue(file.name.endswith('.png'))
+
+    def test_too_many_pixels_rejected(self):
+        width = 6000
+        height = IMAGE_MAX_PIXELS // width + 1
+        with self.assertRaises(ValidationError):
+            self.field.to_internal_value(data_uri((width, height)))
+
+    def test_undecodable_image_rejected(self):
+        prefix, encoded = data_uri((32, 32)).split(',', 1)
+        broken = base64.b64decode(encoded)[:-20]
+        with self.assertRaises(ValidationError):
+            self.field.to_internal_value(
+                f'{prefix},{base64.b64encode(broken).decode()}'
+            )
+
+    def test_extension_follows_actual_format(self):
+        file = self.field.to_internal_value(
+            data_uri((32, 32), mime_type='image/jpeg')
+        )
+        self.assertTrue(file.name.endswith('.png'))
@@ -0,0 +1,45 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.search import index_recipes
+from users.models import User
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class SearchPaginationTests(TestCase):
+    """Выдача поиска сохраняет порядок релевантности при любой пагинации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Авторов', password='password'
+        )
+        cls.by_name = Recipe.objects.create(
+            author=cls.author, name='Борщ', text='Сварить суп',
+            cooking_time=30, image='recipes/images/borsch.png'
+        )
+        cls.by_text = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Почти как борщ',
+            cooking_time=30, image='recipes/images/soup.png'
+        )
+        index_recipes([cls.by_name.pk, cls.by_text.pk])
+
+    def search(self, **params):
+        response = APIClient().get(
+            '/api/recipes/', {'search': 'борщ', **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_search_ordered_by_rank(self):
+        self.assertEqual(self.search(), [self.by_name.pk, self.by_text.pk])
+
+    def test_cursor_pagination_keeps_rank_order(self):
+        self.assertEqual(self.search(pagination='cursor'),
+                         [self.by_name.pk, self.by_text.pk])
+        self.assertEqual(self.search(cursor=''),
+                         [self.by_name.pk, self.by_text.pk])
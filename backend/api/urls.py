@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet,
-                    get_short_link)
+                    get_short_link, metrics)
 
 app_name = 'api'
 
@@ -15,6 +15,7 @@ router.register('tags', TagViewSet, basename='tags')
 
 
 urlpatterns = [
+    path('_metrics', metrics, name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
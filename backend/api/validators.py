@@ -47,14 +47,12 @@ def validate_tags(data):
         raise ValidationError(
             {'tags': ['Хотя бы один тэг должен быть указан.']}
         )
-    tags_list = []
-    for tag_name in data:
-        if not Tag.objects.filter(id=tag_name).exists():
-            raise ValidationError(
-                {'tags': ['Тэг отсутствует в БД.']}
-            )
-        if tag_name in tags_list:
-            raise ValidationError('Тэг должен '
-                                  'быть уникальным')
-        tags_list.append(tag_name)
+    tag_ids = set(data)
+    if len(tag_ids) != len(data):
+        raise ValidationError('Тэг должен '
+                              'быть уникальным')
+    if Tag.objects.filter(id__in=tag_ids).count() != len(tag_ids):
+        raise ValidationError(
+            {'tags': ['Тэг отсутствует в БД.']}
+        )
     return data
@@ -1,21 +1,38 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import zipfile
+
+from django.db.models import BooleanField, Value
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 
+from api.cache import (AnonymousResponseCacheMixin, CatalogConditionalMixin,
+                       response_cache_stats, short_link_cache)
+from api.exports import export_shopping_list
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import PageLimitPagination
+from api.metrics import CONTENT_TYPE, registry
+from api.pagination import KeysetPagination, PageLimitPagination
+from api.parsers import NDJSONParser
 from api.permissions import IsAuthorAdminAuthenticatedOrReadOnly
+from api.renderers import (CSVRenderer, ExportContentNegotiation,
+                           PDFRenderer, PlainTextRenderer)
 from api.serializers import (AvatarUserSerializer, CreateRecipeSerializer,
                              IngredientSerializer, RecipeSerializer,
                              ShortLinkSerializer, ShowFavoriteSerializer,
                              SubscriptionSerializer, TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            RecipeShortLink, ShoppingCart, Tag)
+from recipes.bulk_import import RecipeBatchImporter, RowError
+from recipes.catalog import INGREDIENTS, TAGS
+from recipes.clicks import click_buffer
+from recipes.feed import feed_queryset
+from recipes.images import AVATAR_VARIANTS, update_variants
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeShortLink,
+                            ShoppingCart, Tag)
 from users.models import Subscription, User
 
 
@@ -48,7 +65,7 @@ class UserViewSet(viewsets.GenericViewSet):
         user = request.user
         if user.avatar:
             user.avatar.delete()
-            user.save()
+            update_variants(user, 'avatar', AVATAR_VARIANTS)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'detail': 'Аватар отсутствует.'},
@@ -64,7 +81,9 @@ class UserViewSet(viewsets.GenericViewSet):
         """Просмотр листа подписок пользователя."""
         user = self.request.user
         author_ids = user.following.values_list('author_id', flat=True)
-        subscriptions = User.objects.filter(id__in=author_ids)
+        subscriptions = User.objects.filter(id__in=author_ids).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         list = self.paginate_queryset(subscriptions)
         serializer = SubscriptionSerializer(
             list, many=True, context={'request': request}
@@ -118,16 +137,21 @@ class UserViewSet(viewsets.GenericViewSet):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogConditionalMixin, viewsets.ReadOnlyModelViewSet):
     """Отображение тегов."""
+    catalog = TAGS
+    authentication_classes = []
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogConditionalMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Отображение ингредиентов."""
+    catalog = INGREDIENTS
+    authentication_classes = []
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = IngredientSerializer
@@ -168,6 +192,7 @@ class RecipeListMixin:
 
 
 class RecipeViewSet(
+    AnonymousResponseCacheMixin,
     RecipeListMixin,
     viewsets.ModelViewSet
 ):
@@ -179,8 +204,13 @@ class RecipeViewSet(
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'create', 'delete']
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'feed'):
+            return Recipe.objects.with_user_flags(self.request.user)
+        return super().get_queryset()
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeSerializer
         return CreateRecipeSerializer
 
@@ -220,42 +250,91 @@ class RecipeViewSet(
         return self.remove_from_list(request, pk)
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            pagination_class=KeysetPagination)
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        queryset = feed_queryset(request.user, self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats',
+            permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Счетчики кэша ответов для анонимных пользователей."""
+        return Response(response_cache_stats())
+
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[IsAdminUser],
+            parser_classes=[MultiPartParser, NDJSONParser])
+    def bulk_import(self, request):
+        """Пакетный импорт рецептов из NDJSON или ZIP с картинками."""
+        importer = RecipeBatchImporter(request.user)
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                report = importer.run(upload)
+            else:
+                report = importer.run_ndjson(request.data)
+        except (RowError, zipfile.BadZipFile) as error:
+            return Response({'detail': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[PlainTextRenderer, CSVRenderer, PDFRenderer],
+            content_negotiation_class=ExportContentNegotiation)
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок в формате TXT."""
+        """Скачивание списка покупок в формате TXT, CSV или PDF."""
         if not request.user.is_authenticated:
             return Response(
                 {'detail': 'Пользователь не авторизован.'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        user = self.request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(
-            total_quantity=Sum('amount')
+        format = request.accepted_renderer.format
+        content, hit = export_shopping_list(request.user, format)
+        response = StreamingHttpResponse(
+            content, content_type=request.accepted_media_type
         )
-        lines = []
-        for item in ingredients:
-            lines.append(
-                f"{item['ingredient__name']} - {item['total_quantity']} "
-                f"{item['ingredient__measurement_unit']}\n"
-            )
-        file_content = "Необходимо купить:\n" + ''.join(lines)
-        response = HttpResponse(file_content, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment;'
-                                           'filename="shopping_cart.txt"')
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{format}"'
+        )
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
         return response
 
 
 @api_view(['GET'])
 def get_short_link(request, recipe_id):
-    """Получение-создание короткой ссылки для рецепта."""
-    recipe = get_object_or_404(Recipe, id=recipe_id)
-    short_link, created = RecipeShortLink.objects.get_or_create(recipe=recipe)
+    """
+    Короткая ссылка рецепта; создается вместе с рецептом, а рецептам
+    без ссылки, созданным до кодов из id, - при первом запросе.
+    """
+    short_link = RecipeShortLink.objects.filter(recipe_id=recipe_id).first()
+    if short_link is None:
+        recipe = get_object_or_404(Recipe, pk=recipe_id)
+        short_link, _ = RecipeShortLink.objects.get_or_create(recipe=recipe)
     serializer = ShortLinkSerializer(short_link)
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def resolve_short_link(request, code):
+    """Переход по короткой ссылке на страницу рецепта."""
+    recipe_id = short_link_cache.get(code)
+    if recipe_id is None:
+        recipe_id = RecipeShortLink.objects.filter(
+            short_link=code
+        ).values_list('recipe_id', flat=True).first()
+        if recipe_id is None:
+            raise Http404
+        short_link_cache.set(code, recipe_id)
+    click_buffer.add(recipe_id)
+    return HttpResponseRedirect(f'/recipes/{recipe_id}')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Гистограммы этапов запросов всех процессов в формате Prometheus."""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -2,4 +2,5 @@ python manage.py collectstatic --noinput
 cp -r /app/static/. /backend_static/
 cp -r /app/media/. /backend_media/
 python manage.py migrate
+if [ -n "$METRICS_DIR" ]; then rm -f "$METRICS_DIR"/*.json; fi
 gunicorn foodgram.wsgi:application --bind 0:9090
\ No newline at end of file
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -34,11 +35,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +89,34 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+# По умолчанию файловый и локальный кэши хранят 300 записей и при
+# переполнении удаляют треть, в том числе версии ключей ответов.
+if CACHES['default']['BACKEND'].endswith(('FileBasedCache', 'LocMemCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 60 * 10))
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60 * 60 * 24))
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60)
+)
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv('SHOPPING_LIST_CACHE_MAX_BYTES', 1024 * 1024)
+)
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -136,7 +167,7 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -168,3 +199,33 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SITE_URL = 'https://foodgdrama.webhop.me'
+# Ключ перестановки id в коротких ссылках; после выдачи ссылок не менять.
+SHORT_LINK_KEY = os.getenv('SHORT_LINK_KEY', SECRET_KEY)
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_CLICKS_FLUSH_SIZE = int(
+    os.getenv('SHORT_LINK_CLICKS_FLUSH_SIZE', 1000)
+)
+SHORT_LINK_CLICKS_FLUSH_INTERVAL = float(
+    os.getenv('SHORT_LINK_CLICKS_FLUSH_INTERVAL', 30)
+)
+
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# Общий каталог метрик процессов gunicorn; без него метрики процесса.
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+
+# Выборочный профилировщик запросов; PROFILE_SLOW_MS включает
+# автоматические профили запросов дольше порога.
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 0)) or None
+PROFILE_MAX_ACTIVE = int(os.getenv('PROFILE_MAX_ACTIVE', 4))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+
+# Кэш пользователей токенов: LRU в памяти процесса и, если задан TTL,
+# общий кэш Django. Локальный TTL ограничивает, сколько другие процессы
+# принимают отозванный токен.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+AUTH_TOKEN_SHARED_CACHE_TTL = int(os.getenv('AUTH_TOKEN_SHARED_CACHE_TTL', 0))
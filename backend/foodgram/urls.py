@@ -1,11 +1,15 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from api.views import resolve_short_link
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    re_path(r'^s/(?P<code>[0-9A-Za-z]+)/?$', resolve_short_link,
+            name='short-link'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes.models import (Favorite, ImageJob, Ingredient, Recipe,
+                            RecipeIngredient, RecipeShortLink, ShoppingCart,
+                            Tag)
+from recipes.shopping_list import apply_recipe_delta, recipe_amounts
 
 
 class RecipeIngredientInline(admin.StackedInline):
@@ -28,7 +30,7 @@ class TagAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'name', 'author',
-        'image_tag', 'favorites_count'
+        'image_tag', 'favorites_count', 'in_carts_count'
     )
     inlines = (RecipeIngredientInline,)
     search_fields = ('name', 'author__username',
@@ -44,12 +46,16 @@ class RecipeAdmin(admin.ModelAdmin):
 
     image_tag.short_description = 'Фото рецепта'
 
-    @admin.display(description='Количество в избранных')
-    def favorites_count(self, obj):
-        """Возвращает количество добавлений рецепта в избранное."""
-        if Favorite.objects.filter(recipe=obj).exists():
-            return Favorite.objects.filter(recipe=obj).count()
-        return 0
+    def save_related(self, request, form, formsets, change):
+        """Разница в составе рецепта переносится в списки покупок."""
+        before = recipe_amounts(form.instance.pk) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            after = recipe_amounts(form.instance.pk)
+            apply_recipe_delta(form.instance.pk, {
+                pk: after.get(pk, 0) - before.get(pk, 0)
+                for pk in before.keys() | after.keys()
+            })
 
 
 @admin.register(Ingredient)
@@ -93,3 +99,34 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_editable = ('user', 'recipe')
     search_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    """Админ-модель очереди обработки картинок"""
+    list_display = (
+        'id',
+        'kind',
+        'object_id',
+        'status',
+        'attempts',
+        'updated_at'
+    )
+    list_filter = ('kind', 'status')
+    readonly_fields = ('created_at', 'updated_at')
+    empty_value_display = '-пусто-'
+
+
+@admin.register(RecipeShortLink)
+class RecipeShortLinkAdmin(admin.ModelAdmin):
+    """Админ-модель коротких ссылок"""
+    list_display = (
+        'id',
+        'recipe',
+        'short_link',
+        'clicks'
+    )
+    list_select_related = ('recipe',)
+    search_fields = ('short_link', 'recipe__name')
+    readonly_fields = ('clicks',)
+    ordering = ('-clicks',)
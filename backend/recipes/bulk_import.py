@@ -0,0 +1,300 @@
+"""Пакетный импорт рецептов из NDJSON или ZIP-архива с картинками."""
+import base64
+import binascii
+import io
+import json
+import os
+import time
+import uuid
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+from recipes.constants import (IMAGE_MAX_BYTES, IMAGE_MAX_PIXELS,
+                               MAX_AMOUNT_INGREDIENT, MAX_COOKING_TIME,
+                               MAX_LENGTH_NAME_RECIPE, MAX_LENGTH_TEXT_RECIPE,
+                               MIN_AMOUNT_INGREDIENT, MIN_COOKING_TIME)
+from recipes.images import SOURCE_FORMATS
+from recipes.jobs import enqueue
+from recipes.models import (ImageJob, ImageStatus, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from recipes.search import index_recipes
+from recipes.signals import recipes_imported
+from users.models import User
+from users.validators import validate_alfanumeric_content
+
+RECIPES_MEMBER = 'recipes.ndjson'
+IMAGE_UPLOAD_TO = Recipe._meta.get_field('image').upload_to
+IMAGE_TOO_LARGE = f'Картинка больше {IMAGE_MAX_BYTES // (1024 * 1024)} МБ.'
+IMAGE_TOO_MANY_PIXELS = f'Картинка больше {IMAGE_MAX_PIXELS // 1000000} Мпикс.'
+
+
+class RowError(Exception):
+    """Ошибка в строке импорта; строка пропускается."""
+
+
+class ImportReport:
+    """Итоги импорта: созданные рецепты, ошибки по строкам, скорость."""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, row, message):
+        self.errors.append({'row': row, 'errors': message})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def per_second(self):
+        return round(self.created / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'elapsed': round(self.elapsed, 3),
+            'per_second': self.per_second,
+            'errors': self.errors,
+        }
+
+
+class RecipeBatchImporter:
+    """
+    Проверяет строки по справочникам, загруженным в память,
+    и вставляет рецепты, теги и ингредиенты пачками bulk_create.
+    """
+
+    def __init__(self, default_author, chunk_size=500):
+        self.default_author = default_author
+        self.chunk_size = chunk_size
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.tag_ids = set(self.tags.values())
+        self.ingredients = {
+            (name.casefold(), unit.casefold()): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.ingredient_ids = set(self.ingredients.values())
+        self.authors = {}
+
+    def run_ndjson(self, lines, images=None):
+        """Импорт из последовательности строк NDJSON."""
+        report = ImportReport()
+        chunk = []
+        try:
+            for row, line in enumerate(lines, start=1):
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    report.add_error(row, 'Строка не является JSON.')
+                    continue
+                try:
+                    if not isinstance(data, dict):
+                        raise RowError('Ожидается JSON-объект.')
+                    chunk.append(self.build(data, images))
+                except (RowError, ValidationError) as error:
+                    report.add_error(row, self.message(error))
+                    continue
+                if len(chunk) >= self.chunk_size:
+                    self.insert(chunk, report)
+                    chunk = []
+            if chunk:
+                self.insert(chunk, report)
+        except BaseException:
+            self.discard_images(chunk)
+            raise
+        return report.finish()
+
+    def run_zip(self, file):
+        """Импорт из ZIP: recipes.ndjson и файлы картинок рядом."""
+        with zipfile.ZipFile(file) as archive:
+            if RECIPES_MEMBER not in archive.namelist():
+                raise RowError(f'В архиве нет файла {RECIPES_MEMBER}.')
+            with archive.open(RECIPES_MEMBER) as member:
+                return self.run_ndjson(
+                    io.TextIOWrapper(member, encoding='utf-8'), archive
+                )
+
+    def run(self, file):
+        if zipfile.is_zipfile(file):
+            file.seek(0)
+            return self.run_zip(file)
+        file.seek(0)
+        return self.run_ndjson(file)
+
+    @staticmethod
+    def message(error):
+        if isinstance(error, ValidationError):
+            return ' '.join(error.messages)
+        return str(error)
+
+    def build(self, data, images):
+        """Проверка строки; возвращает рецепт и его связи без записи."""
+        name = str(data.get('name') or '').strip()
+        text = str(data.get('text') or '').strip()
+        if not name or len(name) > MAX_LENGTH_NAME_RECIPE:
+            raise RowError('Некорректное название.')
+        validate_alfanumeric_content(name)
+        if not text or len(text) > MAX_LENGTH_TEXT_RECIPE:
+            raise RowError('Некорректное описание.')
+        try:
+            cooking_time = int(data.get('cooking_time'))
+        except (TypeError, ValueError):
+            raise RowError('Некорректное время приготовления.')
+        if not MIN_COOKING_TIME <= cooking_time <= MAX_COOKING_TIME:
+            raise RowError('Некорректное время приготовления.')
+        recipe = Recipe(
+            author=self.author(data.get('author')),
+            name=name,
+            text=text,
+            cooking_time=cooking_time,
+            image_status=ImageStatus.PROCESSING,
+        )
+        tag_ids = self.tag_list(data.get('tags'))
+        ingredients = self.ingredient_list(data.get('ingredients'))
+        recipe.image = self.save_image(data.get('image'), images)
+        return recipe, tag_ids, ingredients
+
+    def author(self, email):
+        if not email:
+            return self.default_author
+        if email not in self.authors:
+            self.authors[email] = User.objects.filter(email=email).first()
+        if self.authors[email] is None:
+            raise RowError(f'Автор {email} не найден.')
+        return self.authors[email]
+
+    def tag_list(self, tags):
+        if not tags or not isinstance(tags, list):
+            raise RowError('Нужен хотя бы один тег.')
+        if not all(isinstance(tag, (int, str)) for tag in tags):
+            raise RowError('Тег задается id или slug.')
+        tag_ids = [self.tags.get(tag, tag) for tag in tags]
+        if not set(tag_ids) <= self.tag_ids:
+            raise RowError('Тэг отсутствует в БД.')
+        if len(set(tag_ids)) != len(tag_ids):
+            raise RowError('Тэг должен быть уникальным.')
+        return tag_ids
+
+    def ingredient_list(self, ingredients):
+        if not ingredients or not isinstance(ingredients, list):
+            raise RowError('Нужен хоть один ингридиент для рецепта.')
+        result = {}
+        for item in ingredients:
+            if not isinstance(item, dict):
+                raise RowError('Некорректный ингредиент.')
+            if isinstance(item.get('id'), int):
+                ingredient_id = item['id']
+            else:
+                ingredient_id = self.ingredients.get((
+                    str(item.get('name', '')).casefold(),
+                    str(item.get('measurement_unit', '')).casefold()
+                ))
+            if ingredient_id not in self.ingredient_ids:
+                raise RowError('Ингредиента нет в БД.')
+            if ingredient_id in result:
+                raise RowError('Ингридиенты должны быть уникальными.')
+            try:
+                amount = int(item.get('amount'))
+            except (TypeError, ValueError):
+                raise RowError('Некорректное количество ингредиента.')
+            if not MIN_AMOUNT_INGREDIENT <= amount <= MAX_AMOUNT_INGREDIENT:
+                raise RowError('Некорректное количество ингредиента.')
+            result[ingredient_id] = amount
+        return result
+
+    def save_image(self, image, images):
+        """Картинка из data URI или из файла архива."""
+        if not image or not isinstance(image, str):
+            raise RowError('Нужна картинка.')
+        if image.startswith('data:'):
+            try:
+                encoded = image.split(';base64,', 1)[1]
+            except IndexError:
+                raise RowError('Некорректная картинка.')
+            if len(encoded) * 3 // 4 > IMAGE_MAX_BYTES:
+                raise RowError(IMAGE_TOO_LARGE)
+            try:
+                content = base64.b64decode(encoded)
+            except binascii.Error:
+                raise RowError('Некорректная картинка.')
+        elif images is not None:
+            try:
+                info = images.getinfo(image)
+            except KeyError:
+                raise RowError(f'Файл {image} не найден в архиве.')
+            # Размер из заголовка проверяется до распаковки, а чтение
+            # ограничено на случай, если заголовок занижает размер.
+            if info.file_size > IMAGE_MAX_BYTES:
+                raise RowError(IMAGE_TOO_LARGE)
+            with images.open(info) as member:
+                content = member.read(IMAGE_MAX_BYTES + 1)
+            if len(content) > IMAGE_MAX_BYTES:
+                raise RowError(IMAGE_TOO_LARGE)
+        else:
+            raise RowError('Картинка должна быть в формате data URI.')
+        try:
+            with Image.open(io.BytesIO(content)) as picture:
+                picture.verify()
+                extension = SOURCE_FORMATS[picture.format]
+                width, height = picture.size
+        except Image.DecompressionBombError:
+            raise RowError(IMAGE_TOO_MANY_PIXELS)
+        except (KeyError, OSError, SyntaxError, ValueError):
+            raise RowError('Некорректная картинка.')
+        if width * height > IMAGE_MAX_PIXELS:
+            raise RowError(IMAGE_TOO_MANY_PIXELS)
+        return default_storage.save(
+            os.path.join(IMAGE_UPLOAD_TO, f'{uuid.uuid4()}.{extension}'),
+            ContentFile(content)
+        )
+
+    @staticmethod
+    def discard_images(chunk):
+        """Удаление картинок пачки, которая не попала в БД."""
+        for recipe, _, _ in chunk:
+            default_storage.delete(recipe.image.name)
+
+    def insert(self, chunk, report):
+        """Запись пачки рецептов вместе со связями в одной транзакции."""
+        recipes = [recipe for recipe, _, _ in chunk]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save()
+            RecipeTag = Recipe.tags.through
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, tag_ids, _ in chunk
+                for tag_id in tag_ids
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe_id=recipe.pk,
+                                 ingredient_id=ingredient_id,
+                                 amount=amount)
+                for recipe, _, ingredients in chunk
+                for ingredient_id, amount in ingredients.items()
+            )
+            recipe_ids = [recipe.pk for recipe in recipes]
+            index_recipes(recipe_ids)
+            enqueue(ImageJob.Kind.RECIPE, recipe_ids)
+            transaction.on_commit(lambda: recipes_imported.send(
+                sender=Recipe, recipe_ids=recipe_ids
+            ))
+        report.created += len(recipes)
@@ -0,0 +1,27 @@
+"""Версии справочников тегов и ингредиентов."""
+import time
+import uuid
+
+from django.core.cache import cache
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+CATALOG_VERSION_KEY = 'catalog:version:{}'
+
+
+def _new_version():
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_catalog_version(catalog):
+    """Токен версии справочника и время его последнего изменения."""
+    key = CATALOG_VERSION_KEY.format(catalog)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalog_version(catalog):
+    cache.set(CATALOG_VERSION_KEY.format(catalog), _new_version(), None)
@@ -0,0 +1,250 @@
+"""
+Загрузка справочников ингредиентов и тегов без удаления строк.
+
+Строки сопоставляются с базой по ключу: (name, measurement_unit)
+у ингредиентов, slug у тегов. Новые добавляются, отличающиеся
+обновляются, остальные не трогаются. На PostgreSQL файл копируется
+через COPY во временную таблицу и сливается одним INSERT ON CONFLICT.
+Строки, чье уникальное поле (имя тега) уже занято строкой с другим
+ключом, не записываются и попадают в отчет как конфликты.
+"""
+import csv
+import io
+import itertools
+import json
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from recipes.models import Ingredient, Tag
+
+
+class LoadReport:
+    """Число добавленных, обновленных и не изменившихся строк и конфликты."""
+
+    def __init__(self, inserted=0, updated=0, unchanged=0, conflicts=None):
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.conflicts = conflicts or []
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.updated)
+
+
+class CatalogLoader:
+    """
+    Загрузчик справочника модели с ключевыми и изменяемыми полями.
+    unique_fields: изменяемые поля с ограничением уникальности.
+    """
+
+    def __init__(self, model, key_fields, value_fields, batch_size=1000,
+                 unique_fields=()):
+        self.model = model
+        self.key_fields = key_fields
+        self.value_fields = value_fields
+        self.batch_size = batch_size
+        self.unique_fields = unique_fields
+
+    @property
+    def fields(self):
+        return self.key_fields + self.value_fields
+
+    def key(self, row):
+        return tuple(row[field] for field in self.key_fields)
+
+    def read(self, path):
+        """Строки из csv или json-файла в виде словарей."""
+        if path.endswith('.json'):
+            with open(path, encoding='utf-8') as file:
+                rows = json.load(file)
+            if not isinstance(rows, list):
+                raise ValueError(f'{path}: ожидается JSON-массив объектов.')
+            yield from (self.clean(row, path) for row in rows)
+            return
+        with open(path, encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file)
+            if sorted(reader.fieldnames or []) != sorted(self.fields):
+                raise ValueError(
+                    f'Неверный формат файла {path}: '
+                    f'ожидаются поля {", ".join(self.fields)}.'
+                )
+            yield from (self.clean(row, path) for row in reader)
+
+    def clean(self, row, path):
+        if not isinstance(row, dict) or not all(
+            isinstance(row.get(field), str) and row[field].strip()
+            for field in self.fields
+        ):
+            raise ValueError(f'{path}: некорректная строка {row!r}.')
+        return {field: row[field].strip() for field in self.fields}
+
+    def load(self, rows):
+        if connection.vendor == 'postgresql':
+            return self.load_copy(rows)
+        return self.load_batches(rows)
+
+    @transaction.atomic
+    def load_batches(self, rows):
+        """Сверка с базой и запись пачками по batch_size строк."""
+        report = LoadReport()
+        seen = set()
+        rows = iter(rows)
+        while True:
+            chunk = {}
+            for row in itertools.islice(rows, self.batch_size):
+                if self.key(row) not in seen:
+                    chunk[self.key(row)] = row
+            if not chunk:
+                break
+            for key in self.conflicts(chunk):
+                report.conflicts.append(chunk.pop(key))
+            seen.update(chunk)
+            existing = {
+                self.key(vars(obj)): obj
+                for obj in self.model.objects.filter(self.lookup(chunk))
+                if self.key(vars(obj)) in chunk
+            }
+            created, changed = [], []
+            for key, row in chunk.items():
+                obj = existing.get(key)
+                if obj is None:
+                    created.append(self.model(**row))
+                elif any(getattr(obj, field) != row[field]
+                         for field in self.value_fields):
+                    for field in self.value_fields:
+                        setattr(obj, field, row[field])
+                    changed.append(obj)
+            self.model.objects.bulk_create(created, batch_size=self.batch_size)
+            if changed:
+                self.model.objects.bulk_update(
+                    changed, self.value_fields, batch_size=self.batch_size
+                )
+            report.inserted += len(created)
+            report.updated += len(changed)
+            report.unchanged += len(chunk) - len(created) - len(changed)
+        return report
+
+    def conflicts(self, chunk):
+        """Ключи строк, чье уникальное поле занято другим ключом."""
+        keys = set()
+        for field in self.unique_fields:
+            owners = {}
+            for key, row in chunk.items():
+                owners.setdefault(row[field], set()).add(key)
+            for obj in self.model.objects.filter(**{f'{field}__in': owners}):
+                owners[getattr(obj, field)].add(self.key(vars(obj)))
+            for owner_keys in owners.values():
+                if len(owner_keys) > 1:
+                    keys |= owner_keys & chunk.keys()
+        return keys
+
+    def lookup(self, chunk):
+        """Кандидаты по первому ключевому полю; полный ключ сверяется в памяти."""
+        field = self.key_fields[0]
+        return Q(**{f'{field}__in': {key[0] for key in chunk}})
+
+    @transaction.atomic
+    def load_copy(self, rows):
+        """COPY во временную таблицу частями и слияние одним запросом."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        staging = connection.ops.quote_name(
+            f'{self.model._meta.db_table}_staging'
+        )
+        columns = ', '.join(
+            connection.ops.quote_name(field) for field in self.fields
+        )
+        keys = ', '.join(
+            connection.ops.quote_name(field) for field in self.key_fields
+        )
+        if self.value_fields:
+            values = ', '.join(
+                connection.ops.quote_name(field)
+                for field in self.value_fields
+            )
+            current = ', '.join(
+                f'{table}.{connection.ops.quote_name(field)}'
+                for field in self.value_fields
+            )
+            excluded = ', '.join(
+                f'EXCLUDED.{connection.ops.quote_name(field)}'
+                for field in self.value_fields
+            )
+            conflict = (
+                f'DO UPDATE SET ({values}) = ROW({excluded}) '
+                f'WHERE ROW({current}) IS DISTINCT FROM ROW({excluded})'
+            )
+        else:
+            conflict = 'DO NOTHING'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            rows = iter(rows)
+            while True:
+                chunk = list(itertools.islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [row[field] for field in self.fields] for row in chunk
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {staging} ({columns}) FROM STDIN '
+                    'WITH (FORMAT csv)',
+                    buffer
+                )
+            conflicts = {}
+            if self.unique_fields:
+                cursor.execute(self.conflicts_sql(table, staging, columns))
+                for values in cursor.fetchall():
+                    row = dict(zip(self.fields, values))
+                    conflicts[self.key(row)] = row
+            cursor.execute(f'SELECT count(DISTINCT ({keys})) FROM {staging}')
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({keys}) {columns} FROM {staging} '
+                f'ORDER BY {keys} '
+                f'ON CONFLICT ({keys}) {conflict} '
+                'RETURNING (xmax = 0)'
+            )
+            results = [inserted for inserted, in cursor.fetchall()]
+        inserted = sum(results)
+        updated = len(results) - inserted
+        return LoadReport(inserted, updated, total - inserted - updated,
+                          list(conflicts.values()))
+
+    def conflicts_sql(self, table, staging, columns):
+        """
+        Удаление из временной таблицы строк, чье уникальное поле занято
+        в справочнике или в самом файле строкой с другим ключом.
+        """
+        def other_key(alias):
+            return ' OR '.join(
+                f'{alias}.{field} IS DISTINCT FROM staged.{field}'
+                for field in map(connection.ops.quote_name, self.key_fields)
+            )
+        taken = ' OR '.join(
+            f'EXISTS (SELECT 1 FROM {source} AS other '
+            f'WHERE other.{field} = staged.{field} AND ({other_key("other")}))'
+            for field in map(connection.ops.quote_name, self.unique_fields)
+            for source in (table, staging)
+        )
+        return (f'DELETE FROM {staging} AS staged WHERE {taken} '
+                f'RETURNING {columns}')
+
+
+def ingredient_loader(batch_size=1000):
+    return CatalogLoader(
+        Ingredient, ['name', 'measurement_unit'], [], batch_size
+    )
+
+
+def tag_loader(batch_size=1000):
+    return CatalogLoader(Tag, ['slug'], ['name'], batch_size,
+                         unique_fields=['name'])
@@ -0,0 +1,98 @@
+"""
+Счетчик переходов по коротким ссылкам с накоплением в памяти процесса.
+
+Переходы копятся в Counter и записываются пачкой UPDATE по достижении
+порога числа переходов, по таймеру и при завершении процесса.
+"""
+import atexit
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import BigIntegerField, Case, F, Value, When
+
+from recipes.models import RecipeShortLink
+
+UPDATE_BATCH_SIZE = 500
+
+
+class ClickBuffer:
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._counts = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, recipe_id):
+        with self._lock:
+            self._counts[recipe_id] += 1
+            self._total += 1
+            full = self._total >= self.flush_size
+            if not full:
+                self._start_timer()
+        if full:
+            self.flush()
+
+    def _start_timer(self):
+        """Запуск таймера записи; вызывается под блокировкой."""
+        if self._timer is None:
+            self._timer = threading.Timer(
+                self.flush_interval, self._flush_on_timer
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _restore(self, items):
+        """Возврат незаписанных переходов в буфер после ошибки записи."""
+        with self._lock:
+            for recipe_id, count in items:
+                self._counts[recipe_id] += count
+                self._total += count
+            self._start_timer()
+
+    def pending(self, recipe_id):
+        """Переходы, еще не записанные в базу этим процессом."""
+        with self._lock:
+            return self._counts[recipe_id]
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Запись накопленных переходов: один UPDATE на пачку ссылок."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._total = 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        items = list(counts.items())
+        for start in range(0, len(items), UPDATE_BATCH_SIZE):
+            batch = items[start:start + UPDATE_BATCH_SIZE]
+            try:
+                RecipeShortLink.objects.filter(
+                    recipe_id__in=[recipe_id for recipe_id, _ in batch]
+                ).update(clicks=F('clicks') + Case(
+                    *(When(recipe_id=recipe_id, then=Value(count))
+                      for recipe_id, count in batch),
+                    default=Value(0),
+                    output_field=BigIntegerField()
+                ))
+            except Exception:
+                self._restore(items[start:])
+                raise
+        return len(items)
+
+
+click_buffer = ClickBuffer(
+    settings.SHORT_LINK_CLICKS_FLUSH_SIZE,
+    settings.SHORT_LINK_CLICKS_FLUSH_INTERVAL
+)
+atexit.register(click_buffer.flush)
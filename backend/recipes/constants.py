@@ -10,4 +10,14 @@ MAX_AMOUNT_INGREDIENT = 666666
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 1440
 STRING_FOR_RANDOM = string.ascii_letters + string.digits
-MAX_LENGTH_SHORT_LINK = 3
+MAX_LENGTH_SHORT_LINK = 6
+FUZZY_SEARCH_LIMIT = 20
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+FEED_MAX_ENTRIES = 500
+FEED_BATCH_SIZE = 1000
+FEED_FANOUT_LIMIT = 5000
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 25 * 1000 * 1000
+IMAGE_QUALITY = 82
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_STALE_SECONDS = 10 * 60
@@ -0,0 +1,38 @@
+"""Поддержка денормализованных счетчиков рецептов и пользователей."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счетчика одной строки, не ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount_recipes(recipe_ids):
+    """Пересчет счетчиков избранного и корзин по данным связей."""
+    return Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=_count(Favorite, 'recipe'),
+        in_carts_count=_count(ShoppingCart, 'recipe'),
+    )
+
+
+def recount_users(user_ids):
+    """Пересчет счетчиков рецептов и подписок пользователей."""
+    return User.objects.filter(pk__in=user_ids).update(
+        recipes_count=_count(Recipe, 'author'),
+        followers_count=_count(Subscription, 'author'),
+        following_count=_count(Subscription, 'user'),
+    )
@@ -0,0 +1,95 @@
+"""
+Лента рецептов от авторов, на которых подписан пользователь.
+
+Новые рецепты раскладываются по лентам подписчиков при записи.
+Авторы с числом подписчиков от FEED_FANOUT_LIMIT в ленты не пишутся:
+их рецепты добавляются в выборку при чтении.
+"""
+from django.db.models import F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.constants import (FEED_BATCH_SIZE, FEED_FANOUT_LIMIT,
+                               FEED_MAX_ENTRIES)
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+def trim_feeds(user_ids):
+    """Удаление записей сверх FEED_MAX_ENTRIES в лентах пользователей."""
+    sql, params = FeedEntry.objects.filter(user_id__in=user_ids).annotate(
+        feed_rank=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=F('recipe_id').desc()
+        )
+    ).order_by().values('id', 'feed_rank').query.sql_with_params()
+    FeedEntry.objects.filter(pk__in=RawSQL(
+        f'SELECT id FROM ({sql}) ranked WHERE feed_rank > %s',
+        (*params, FEED_MAX_ENTRIES)
+    )).delete()
+
+
+def fan_out(recipe_ids):
+    """Добавление новых рецептов в ленты подписчиков их авторов пачками."""
+    by_author = {}
+    for pk, author_id in Recipe.objects.filter(
+        pk__in=recipe_ids,
+        author__followers_count__lt=FEED_FANOUT_LIMIT
+    ).values_list('id', 'author_id'):
+        by_author.setdefault(author_id, []).append(pk)
+    for author_id, author_recipes in by_author.items():
+        followers = Subscription.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True).order_by('user_id')
+        batch = []
+        for user_id in followers.iterator(chunk_size=FEED_BATCH_SIZE):
+            batch.append(user_id)
+            if len(batch) >= FEED_BATCH_SIZE:
+                _write(batch, author_recipes)
+                batch = []
+        if batch:
+            _write(batch, author_recipes)
+
+
+def _write(user_ids, recipe_ids):
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id in user_ids for recipe_id in recipe_ids),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim_feeds(user_ids)
+
+
+def backfill(user_id, author_id):
+    """Последние рецепты автора в ленту нового подписчика."""
+    if User.objects.filter(
+        pk=author_id, followers_count__gte=FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    recipe_ids = Recipe.objects.filter(author_id=author_id).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:FEED_MAX_ENTRIES]
+    _write([user_id], list(recipe_ids))
+
+
+def prune(user_id, author_id):
+    """Удаление рецептов автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def feed_queryset(user, queryset=None):
+    """Рецепты ленты: записи из таблицы и рецепты крупных авторов."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    followed = Subscription.objects.filter(user=user).values('author_id')
+    return queryset.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+        | Q(
+            author_id__in=followed,
+            author__followers_count__gte=FEED_FANOUT_LIMIT
+        )
+    )
@@ -0,0 +1,131 @@
+"""Уменьшенные копии картинок рецептов и аватаров в WebP и JPEG."""
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from recipes.constants import IMAGE_MAX_BYTES, IMAGE_MAX_PIXELS, IMAGE_QUALITY
+
+# Вариант: (размер, обрезать ли до точного размера).
+RECIPE_VARIANTS = {
+    'list': ((480, 320), True),
+    'detail': ((1200, 800), False),
+}
+AVATAR_VARIANTS = {
+    'avatar': ((160, 160), True),
+}
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+# Принимаемые форматы исходных картинок и расширения их файлов.
+SOURCE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+VARIANTS_DIR = 'variants'
+
+
+def _check_pixels(image):
+    if image.width * image.height > IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка больше {IMAGE_MAX_PIXELS // 1000000} Мпикс.'
+        )
+
+
+def validate_image_size(file):
+    """Ограничение размера файла; сама картинка разбирается в фоне."""
+    if file.size > IMAGE_MAX_BYTES:
+        raise ValidationError(
+            f'Файл картинки больше {IMAGE_MAX_BYTES // (1024 * 1024)} МБ.'
+        )
+
+
+def _flatten(image):
+    """RGB без прозрачности: прозрачные области заливаются белым."""
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(name, variants):
+    """
+    Копии картинки из хранилища: {вариант: {формат: имя файла, width}}.
+    Размеры любого формата проверяются по заголовку до декодирования,
+    так что память ограничена IMAGE_MAX_PIXELS; JPEG к тому же
+    декодируется сразу в масштабе самого крупного варианта (draft).
+    """
+    largest = max(size for size, _ in variants.values())
+    stem = os.path.splitext(os.path.basename(name))[0]
+    directory = os.path.join(os.path.dirname(name), VARIANTS_DIR)
+    result = {}
+    with default_storage.open(name, 'rb') as file, \
+            Image.open(file) as original:
+        _check_pixels(original)
+        original.draft('RGB', largest)
+        image = _flatten(ImageOps.exif_transpose(original))
+    for variant, (size, crop) in variants.items():
+        if crop:
+            rendition = ImageOps.fit(image, size, Image.LANCZOS)
+        else:
+            rendition = image.copy()
+            rendition.thumbnail(size, Image.LANCZOS)
+        result[variant] = {'width': rendition.width}
+        for extension, format in FORMATS.items():
+            buffer = io.BytesIO()
+            rendition.save(buffer, format, quality=IMAGE_QUALITY)
+            result[variant][extension] = default_storage.save(
+                os.path.join(directory, f'{stem}_{variant}.{extension}'),
+                ContentFile(buffer.getvalue())
+            )
+    return result
+
+
+def delete_variants(variants):
+    for files in (variants or {}).values():
+        for extension in FORMATS:
+            if files.get(extension):
+                default_storage.delete(files[extension])
+
+
+def clear_variants(instance, field):
+    """
+    Сброс копий перед заменой картинки; модель не сохраняется.
+    Файлы удаляются после коммита: при откате БД ссылается на них.
+    """
+    variants_field = f'{field}_variants'
+    old = getattr(instance, variants_field)
+    transaction.on_commit(lambda: delete_variants(old))
+    setattr(instance, variants_field, {})
+
+
+def update_variants(instance, field, variants, **values):
+    """Пересоздание копий картинки поля field; старые файлы удаляются."""
+    variants_field = f'{field}_variants'
+    old = getattr(instance, variants_field)
+    image = getattr(instance, field)
+    setattr(
+        instance, variants_field,
+        render_variants(image.name, variants) if image else {}
+    )
+    for name, value in values.items():
+        setattr(instance, name, value)
+    instance.save(update_fields=[variants_field, *values])
+    transaction.on_commit(lambda: delete_variants(old))
+
+
+def srcset(variants, request=None):
+    """Строки srcset по форматам: {"webp": "url 480w, url 1200w", ...}."""
+    ordered = sorted((variants or {}).values(), key=lambda item: item['width'])
+    result = {}
+    for extension in FORMATS:
+        urls = []
+        for files in ordered:
+            url = default_storage.url(files[extension])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls.append(f"{url} {files['width']}w")
+        if urls:
+            result[extension] = ', '.join(urls)
+    return result
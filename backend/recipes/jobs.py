@@ -0,0 +1,125 @@
+"""
+Очередь фоновой обработки картинок в таблице ImageJob.
+
+Запрос проверяет картинку, сохраняет исходный файл и ставит задание;
+копии картинки создает команда process_jobs. Если обработка не удалась,
+файл удаляется, а поле картинки очищается.
+"""
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from recipes.constants import IMAGE_JOB_MAX_ATTEMPTS, IMAGE_JOB_STALE_SECONDS
+from recipes.images import AVATAR_VARIANTS, RECIPE_VARIANTS, update_variants
+from recipes.models import ImageJob, ImageStatus, Recipe
+from users.models import User
+
+TARGETS = {
+    ImageJob.Kind.RECIPE: (Recipe, 'image', RECIPE_VARIANTS),
+    ImageJob.Kind.AVATAR: (User, 'avatar', AVATAR_VARIANTS),
+}
+# Ошибки самой картинки: повтор не поможет.
+INVALID_IMAGE_ERRORS = (
+    ValidationError, UnidentifiedImageError, Image.DecompressionBombError
+)
+
+
+def enqueue(kind, object_ids):
+    """Задания для объектов, у которых еще нет ожидающего задания."""
+    waiting = set(ImageJob.objects.filter(
+        kind=kind, object_id__in=object_ids, status=ImageJob.Status.PENDING
+    ).values_list('object_id', flat=True))
+    ImageJob.objects.bulk_create(
+        ImageJob(kind=kind, object_id=pk)
+        for pk in object_ids if pk not in waiting
+    )
+
+
+def requeue_stale():
+    """Возврат в очередь заданий, брошенных упавшим обработчиком."""
+    return ImageJob.objects.filter(
+        status=ImageJob.Status.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(
+            seconds=IMAGE_JOB_STALE_SECONDS
+        )
+    ).update(status=ImageJob.Status.PENDING, updated_at=timezone.now())
+
+
+def claim(limit):
+    """
+    Захват до limit ожидающих заданий. Условный UPDATE по статусу
+    не дает двум обработчикам взять одно задание.
+    """
+    claimed = [
+        pk for pk in ImageJob.objects.filter(
+            status=ImageJob.Status.PENDING
+        ).values_list('pk', flat=True)[:limit]
+        if ImageJob.objects.filter(
+            pk=pk, status=ImageJob.Status.PENDING
+        ).update(
+            status=ImageJob.Status.RUNNING,
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now()
+        )
+    ]
+    return list(ImageJob.objects.filter(pk__in=claimed))
+
+
+def _message(error):
+    if isinstance(error, ValidationError):
+        return ' '.join(error.messages)
+    return str(error) or error.__class__.__name__
+
+
+def run(job):
+    """Выполнение задания; возвращает итоговый статус."""
+    model, field, variants = TARGETS[job.kind]
+    instance = model.objects.filter(pk=job.object_id).first()
+    values = {'image_status': ImageStatus.READY} if model is Recipe else {}
+    try:
+        if instance is not None:
+            update_variants(instance, field, variants, **values)
+    except INVALID_IMAGE_ERRORS as error:
+        return _finish(job, instance, ImageJob.Status.FAILED, error)
+    except OSError as error:
+        status = (ImageJob.Status.PENDING
+                  if job.attempts < IMAGE_JOB_MAX_ATTEMPTS
+                  else ImageJob.Status.FAILED)
+        return _finish(job, instance, status, error)
+    return _finish(job, instance, ImageJob.Status.DONE)
+
+
+def _discard(job, instance):
+    """
+    Очистка поля с непригодной картинкой и удаление ее файла.
+    Картинку, замененную за время обработки, задание не трогает.
+    """
+    model, field, _ = TARGETS[job.kind]
+    image = getattr(instance, field)
+    with transaction.atomic():
+        if not model.objects.select_for_update().filter(
+            pk=instance.pk, **{field: image.name}
+        ).exists():
+            return
+        name = image.name
+        setattr(instance, field, None)
+        update_fields = [field]
+        if model is Recipe:
+            instance.image_status = ImageStatus.FAILED
+            update_fields.append('image_status')
+        instance.save(update_fields=update_fields)
+        transaction.on_commit(lambda: image.storage.delete(name))
+
+
+def _finish(job, instance, status, error=None):
+    job.status = status
+    job.error = _message(error) if error else ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    if (status == ImageJob.Status.FAILED and instance is not None
+            and getattr(instance, TARGETS[job.kind][1])):
+        _discard(job, instance)
+    return status
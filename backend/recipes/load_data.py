@@ -0,0 +1,355 @@
+"""
+Генерация синтетических данных в масштабе продакшена.
+
+Популярность авторов и рецептов, активность пользователей, ингредиентов
+и тегов распределена по степенному закону (Ципф). Случайность задается
+зерном и номером пачки, поэтому результат не зависит от числа процессов.
+"""
+import io
+import itertools
+import math
+import multiprocessing
+import os
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image
+
+from recipes.catalog_loader import ingredient_loader, tag_loader
+from recipes.constants import (MAX_AMOUNT_INGREDIENT, MAX_COOKING_TIME,
+                               MIN_COOKING_TIME)
+from recipes.counters import recount_recipes, recount_users
+from recipes.images import RECIPE_VARIANTS, render_variants
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import index_recipes
+from recipes.shopping_list import rebuild as rebuild_shopping_lists
+from recipes.signals import recipes_imported
+from users.models import Subscription, User
+
+PLACEHOLDER_IMAGE = os.path.join(
+    Recipe._meta.get_field('image').upload_to, 'seed_placeholder.jpg'
+)
+DISHES = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Каша', 'Запеканка', 'Омлет',
+          'Паста', 'Плов', 'Котлеты', 'Блины', 'Соус', 'Десерт', 'Смузи')
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Сергей',
+               'Елена', 'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Соколов', 'Михайлов', 'Новиков', 'Федоров', 'Морозов')
+AMOUNTS = (1, 2, 3, 5, 10, 20, 30, 50, 100, 150, 200, 250, 300, 500, 1000)
+TAGS_PER_RECIPE = ((1, 2, 3), (6, 3, 1))
+
+# Показатели степенного закона: чем больше, тем сильнее перекос.
+AUTHOR_SKEW = 1.2
+RECIPE_SKEW = 1.1
+ACTIVITY_SKEW = 1.0
+CATALOG_SKEW = 1.0
+
+# Доля рецептов или авторов, доступная одному пользователю.
+MAX_DEGREE_SHARE = 0.1
+
+# Состояние для процессов пула; передается через fork.
+_generator = None
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса рангов 1..count по закону Ципфа."""
+    return list(itertools.accumulate(
+        1 / (rank ** skew) for rank in range(1, count + 1)
+    ))
+
+
+def placeholder_image():
+    """Общая картинка всех рецептов и ее копии; создаются один раз."""
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), (230, 190, 140)).save(buffer, 'JPEG')
+        default_storage.save(PLACEHOLDER_IMAGE,
+                             ContentFile(buffer.getvalue()))
+    return PLACEHOLDER_IMAGE, render_variants(
+        PLACEHOLDER_IMAGE, RECIPE_VARIANTS
+    )
+
+
+class LoadDataGenerator:
+    """
+    Пользователи и рецепты вставляются последовательно, чтобы их id шли
+    в порядке генерации. Связи рецептов, избранное, корзины и подписки
+    строятся независимыми пачками, которые можно раздать процессам.
+    """
+
+    def __init__(self, users, recipes, favorites, carts, subscriptions,
+                 seed=0, batch_size=2000, prefix='load', log=print):
+        self.counts = {
+            'users': users,
+            'recipes': recipes,
+            Favorite: favorites,
+            ShoppingCart: carts,
+            Subscription: subscriptions,
+        }
+        self.seed = seed
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.log = log
+
+    def random(self, *parts):
+        return random.Random(':'.join(map(str, (self.seed,) + parts)))
+
+    def run(self, workers=1):
+        rnd = self.random('main')
+        self.load_catalog(rnd)
+        self.user_ids = self.create_users()
+        self.authors = rnd.sample(self.user_ids, len(self.user_ids))
+        self.authors_weights = zipf_weights(len(self.authors), AUTHOR_SKEW)
+        self.active = rnd.sample(self.user_ids, len(self.user_ids))
+        self.active_weights = zipf_weights(len(self.active), ACTIVITY_SKEW)
+
+        self.recipe_ids = self.create_recipes()
+        self.popular = rnd.sample(self.recipe_ids, len(self.recipe_ids))
+        self.popular_weights = zipf_weights(len(self.popular), RECIPE_SKEW)
+        self.expected = {
+            model: self.degrees(model, population)
+            for model, population in ((Favorite, self.popular),
+                                      (ShoppingCart, self.popular),
+                                      (Subscription, self.authors))
+        }
+
+        tasks = [
+            ('links', index, start)
+            for index, start in enumerate(
+                range(0, len(self.recipe_ids), self.batch_size)
+            )
+        ] + [
+            (phase, index, start)
+            for phase in ('favorites', 'carts', 'subscriptions')
+            for index, start in enumerate(
+                range(0, len(self.active), self.batch_size)
+            )
+        ]
+        self.log(f'Связи рецептов, избранное, корзины и подписки: '
+                 f'{len(tasks)} пачек, процессов: {workers}')
+        if workers > 1:
+            global _generator
+            _generator = self
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for _ in pool.imap_unordered(_run_task, tasks):
+                    pass
+            _generator = None
+        else:
+            for task in tasks:
+                self.run_task(*task)
+        self.finish()
+
+    def load_catalog(self, rnd):
+        """Справочники из data/ и их ранги популярности."""
+        for make_loader, file_name in ((ingredient_loader, 'ingredients.csv'),
+                                       (tag_loader, 'tags.csv')):
+            loader = make_loader(self.batch_size)
+            loader.load(loader.read(
+                os.path.join(settings.CSV_DIR, file_name)
+            ))
+        ingredients = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', 'name'
+        ))
+        tags = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+        self.ingredients = rnd.sample(ingredients, len(ingredients))
+        self.ingredients_weights = zipf_weights(
+            len(self.ingredients), CATALOG_SKEW
+        )
+        self.tags = rnd.sample(tags, len(tags))
+        self.tags_weights = zipf_weights(len(self.tags), CATALOG_SKEW)
+
+    def create_users(self):
+        total = self.counts['users']
+        self.log(f'Пользователи: {total}')
+        password = make_password('loadtest')
+        rnd = self.random('users')
+        last_id = _last_id(User)
+        User.objects.bulk_create(
+            (User(username=f'{self.prefix}{i}',
+                  email=f'{self.prefix}{i}@example.com',
+                  first_name=rnd.choice(FIRST_NAMES),
+                  last_name=rnd.choice(LAST_NAMES),
+                  password=password)
+             for i in range(total)),
+            batch_size=self.batch_size
+        )
+        return _new_ids(User, last_id)
+
+    def create_recipes(self):
+        total = self.counts['recipes']
+        self.log(f'Рецепты: {total}')
+        image, variants = placeholder_image()
+        rnd = self.random('recipes')
+        authors = rnd.choices(self.authors, cum_weights=self.authors_weights,
+                              k=total)
+        last_id = _last_id(Recipe)
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=author_id,
+                    name=f'{rnd.choice(DISHES)} №{i}',
+                    text='Смешайте ингредиенты и готовьте до готовности.',
+                    image=image,
+                    image_variants=variants,
+                    cooking_time=min(max(
+                        round(rnd.lognormvariate(math.log(30), 0.7)),
+                        MIN_COOKING_TIME
+                    ), MAX_COOKING_TIME))
+             for i, author_id in enumerate(authors)),
+            batch_size=self.batch_size
+        )
+        return _new_ids(Recipe, last_id)
+
+    def run_task(self, phase, index, start):
+        rnd = self.random(phase, index)
+        if phase == 'links':
+            self.create_links(rnd, start)
+        elif phase == 'favorites':
+            self.create_pairs(rnd, start, Favorite, 'recipe_id',
+                              self.popular)
+        elif phase == 'carts':
+            self.create_pairs(rnd, start, ShoppingCart, 'recipe_id',
+                              self.popular)
+        else:
+            self.create_pairs(rnd, start, Subscription, 'author_id',
+                              self.authors)
+
+    @staticmethod
+    def distinct(rnd, population, cum_weights, count, exclude=None):
+        """До count разных элементов, выбранных с весами."""
+        found = set()
+        for _ in range(count * 4):
+            if len(found) >= count:
+                break
+            found.update(rnd.choices(
+                population, cum_weights=cum_weights, k=count - len(found)
+            ))
+            found.discard(exclude)
+        return list(found)[:count]
+
+    def create_links(self, rnd, start):
+        """Теги и ингредиенты пачки рецептов."""
+        recipe_ids = self.recipe_ids[start:start + self.batch_size]
+        RecipeTag = Recipe.tags.through
+        tags, ingredients = [], []
+        for recipe_id in recipe_ids:
+            count = rnd.choices(*TAGS_PER_RECIPE)[0]
+            tags.extend(
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in self.distinct(rnd, self.tags,
+                                            self.tags_weights, count)
+            )
+            count = min(max(round(rnd.gauss(8, 3)), 2), 20)
+            ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient[0],
+                    amount=min(rnd.choice(AMOUNTS), MAX_AMOUNT_INGREDIENT)
+                )
+                for ingredient in self.distinct(
+                    rnd, self.ingredients, self.ingredients_weights, count
+                )
+            )
+        RecipeTag.objects.bulk_create(tags, batch_size=self.batch_size)
+        RecipeIngredient.objects.bulk_create(ingredients,
+                                             batch_size=self.batch_size)
+
+    def degrees(self, model, population):
+        """
+        Ожидаемое число связей каждого активного пользователя:
+        пропорционально весу, не больше доли MAX_DEGREE_SHARE целей.
+        Остаток от ограниченных пользователей делится между прочими.
+        """
+        limit = max(int(len(population) * MAX_DEGREE_SHARE), 1)
+        weights = [
+            weight - previous for previous, weight in zip(
+                [0] + self.active_weights, self.active_weights
+            )
+        ]
+        remaining, capped = self.counts[model], 0
+        # Веса убывают, поэтому ограниченные пользователи идут первыми.
+        while capped < len(weights):
+            scale = remaining / (self.active_weights[-1] - (
+                self.active_weights[capped - 1] if capped else 0
+            ))
+            if weights[capped] * scale <= limit:
+                break
+            remaining -= limit
+            capped += 1
+        return [limit] * capped + [
+            weight * scale for weight in weights[capped:]
+        ]
+
+    def create_pairs(self, rnd, start, model, field, population):
+        """
+        Связи пачки пользователей с целями, выбранными по весу
+        популярности без повторов.
+        """
+        cum_weights = {
+            Subscription: self.authors_weights
+        }.get(model, self.popular_weights)
+        expected = self.expected[model][start:start + self.batch_size]
+        rows = []
+        for user_id, degree in zip(
+            self.active[start:start + self.batch_size], expected
+        ):
+            rows.extend(
+                model(user_id=user_id, **{field: target})
+                for target in self.distinct(
+                    rnd, population, cum_weights,
+                    int(degree) + (rnd.random() < degree % 1),
+                    exclude=user_id if model is Subscription else None
+                )
+            )
+        model.objects.bulk_create(rows, batch_size=self.batch_size,
+                                  ignore_conflicts=True)
+
+    def finish(self):
+        """
+        Производные данные: счетчики, поиск, короткие ссылки, ленты
+        и итоги списков покупок. Счетчики подписчиков пересчитываются
+        до раскладки лент: по ним отбираются крупные авторы.
+        """
+        self.log('Счетчики и итоги списков покупок')
+        for start in range(0, len(self.user_ids), self.batch_size):
+            user_ids = self.user_ids[start:start + self.batch_size]
+            recount_users(user_ids)
+            rebuild_shopping_lists(user_ids)
+        self.log('Поиск, короткие ссылки и ленты')
+        for start in range(0, len(self.recipe_ids), self.batch_size):
+            recipe_ids = self.recipe_ids[start:start + self.batch_size]
+            index_recipes(recipe_ids)
+            recount_recipes(recipe_ids)
+            recipes_imported.send(sender=Recipe, recipe_ids=recipe_ids)
+
+    def summary(self):
+        """Число созданных строк по таблицам."""
+        first_user = self.user_ids[0] if self.user_ids else 0
+        return {
+            'users': len(self.user_ids),
+            'recipes': len(self.recipe_ids),
+            **{
+                model._meta.verbose_name_plural: model.objects.filter(
+                    user_id__gte=first_user
+                ).count()
+                for model in (Favorite, ShoppingCart, Subscription)
+            },
+        }
+
+
+def _last_id(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def _new_ids(model, last_id):
+    return list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True))
+
+
+def _run_task(task):
+    return _generator.run_task(*task)
@@ -0,0 +1,48 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from recipes.images import AVATAR_VARIANTS, RECIPE_VARIANTS, update_variants
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий картинок рецептов и аватаров '
+            'для уже загруженных файлов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии и там, где они уже есть.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        for model, field, variants in (
+            (Recipe, 'image', RECIPE_VARIANTS),
+            (User, 'avatar', AVATAR_VARIANTS),
+        ):
+            queryset = model.objects.exclude(
+                **{f'{field}__isnull': True}
+            ).exclude(**{field: ''}).order_by('pk')
+            if not options['force']:
+                queryset = queryset.filter(**{f'{field}_variants': {}})
+            done = failed = 0
+            for instance in queryset.iterator(
+                chunk_size=options['chunk_size']
+            ):
+                try:
+                    update_variants(instance, field, variants)
+                except (OSError, UnidentifiedImageError,
+                        ValidationError) as error:
+                    failed += 1
+                    self.stderr.write(
+                        f'{model.__name__} {instance.pk}: {error}'
+                    )
+                    continue
+                done += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'создано {done}, ошибок {failed}'
+            )
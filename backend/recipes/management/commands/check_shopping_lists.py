@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import find_drift, rebuild
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сверка итогов списков покупок с корзинами '
+            'и отчет о расхождениях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать итоги пользователей с расхождениями.'
+        )
+
+    def handle(self, *args, **options):
+        drifted_users = set()
+        drift_rows = 0
+        last_id = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            drift = find_drift(user_ids)
+            for (user_id, ingredient_id), (stored, expected) in sorted(
+                drift.items()
+            ):
+                self.stdout.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'в таблице {stored}, по корзине {expected}'
+                )
+            users = {user_id for user_id, _ in drift}
+            if options['fix'] and users:
+                rebuild(users)
+            drifted_users |= users
+            drift_rows += len(drift)
+        self.stdout.write(
+            f'Расхождений: {drift_rows}, '
+            f'пользователей: {len(drifted_users)}'
+            + (', исправлено.' if options['fix'] and drift_rows else '.')
+        )
@@ -1,40 +1,51 @@
-import csv
+import os
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient, Tag
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipes.catalog_loader import ingredient_loader, tag_loader
+from recipes.signals import catalog_loaded
 
-ModelsCSV = {
-    Ingredient: 'ingredients.csv',
-    Tag: 'tags.csv',
-}
-
-EXPECTED_HEADERS = {
-    Ingredient: ['name', 'measurement_unit'],
-    Tag: ['name', 'slug'],
-}
+CATALOGS = (
+    ('ingredients', INGREDIENTS, ingredient_loader, 'ingredients.csv'),
+    ('tags', TAGS, tag_loader, 'tags.csv'),
+)
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv файлов'
+    help = ('Импорт справочников ингредиентов и тегов из csv или json '
+            'без удаления существующих строк')
+
+    def add_arguments(self, parser):
+        for option, _, _, file_name in CATALOGS:
+            parser.add_argument(
+                f'--{option}',
+                default=os.path.join(settings.CSV_DIR, file_name),
+                help='Путь к файлу .csv или .json.'
+            )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
-        for model, csv_file in ModelsCSV.items():
-            model.objects.all().delete()
-            path_to_file = f'{settings.CSV_DIR}/{csv_file}'
-            print(f'Начат импорт данных из файла {path_to_file}')
-
-            with open(path_to_file, mode='r', encoding='utf-8') as csv_file:
-                reader = csv.DictReader(csv_file)
-                header = reader.fieldnames
-
-                if header != EXPECTED_HEADERS[model]:
-                    raise ValueError(
-                        f'Неверный формат файла {csv_file.name}: '
-                        f'неправильные заголовки полей.'
-                    )
-                model.objects.bulk_create(model(**data) for data in reader)
+        for option, catalog, make_loader, _ in CATALOGS:
+            path = options[option]
+            self.stdout.write(f'Начат импорт данных из файла {path}')
+            loader = make_loader(options['batch_size'])
+            try:
+                report = loader.load(loader.read(path))
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+            if report.changed:
+                bump_catalog_version(catalog)
+                catalog_loaded.send(sender=loader.model, report=report)
+            for row in report.conflicts:
+                self.stderr.write(
+                    f'Конфликт: {row} - значение уже занято другой строкой.'
+                )
             self.stdout.write(
-                f'Завершен импорт данных в модель {model.__name__}')
-        self.stdout.write('Импорт всех данных завершен.')
+                f'{loader.model.__name__}: добавлено {report.inserted}, '
+                f'обновлено {report.updated}, '
+                f'без изменений {report.unchanged}, '
+                f'конфликтов {len(report.conflicts)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Импорт всех данных завершен.'))
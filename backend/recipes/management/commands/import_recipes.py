@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.bulk_import import RecipeBatchImporter, RowError
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт рецептов из NDJSON или ZIP-архива с картинками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .ndjson или .zip')
+        parser.add_argument(
+            '--author', required=True,
+            help='E-mail автора для строк без поля author.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(email=options['author']).first()
+        if author is None:
+            raise CommandError(f"Автор {options['author']} не найден.")
+        importer = RecipeBatchImporter(author, options['chunk_size'])
+        try:
+            with open(options['path'], 'rb') as file:
+                report = importer.run(file)
+        except RowError as error:
+            raise CommandError(str(error))
+        for error in report.errors:
+            self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+        self.stdout.write(
+            f'Создано рецептов: {report.created}, '
+            f'ошибок: {len(report.errors)}, '
+            f'время: {report.elapsed:.2f} с, '
+            f'скорость: {report.per_second} рецептов/с'
+        )
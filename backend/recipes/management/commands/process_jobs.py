@@ -0,0 +1,50 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.jobs import claim, requeue_stale, run
+
+
+def run_job(job):
+    """Задание в потоке пула со своим соединением с базой."""
+    close_old_connections()
+    try:
+        return run(job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = ('Фоновая обработка загруженных картинок из очереди ImageJob '
+            'в пуле потоков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch', type=int, default=20)
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help='Пауза между опросами пустой очереди, с.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while True:
+                requeue_stale()
+                jobs = claim(options['batch'])
+                if jobs:
+                    statuses = Counter(pool.map(run_job, jobs))
+                    self.stdout.write(', '.join(
+                        f'{status}: {count}'
+                        for status, count in sorted(statuses.items())
+                    ))
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill
+from recipes.models import FeedEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписчиков по существующим подпискам'
+
+    def handle(self, *args, **options):
+        FeedEntry.objects.all().delete()
+        subscriptions = Subscription.objects.order_by('pk').values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in subscriptions.iterator():
+            backfill(user_id, author_id)
+        self.stdout.write(
+            f'Записей в лентах: {FeedEntry.objects.count()}'
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_recipes, recount_users
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пересчет денормализованных счетчиков рецептов '
+            'и пользователей пачками по id')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, recount in ((Recipe, recount_recipes),
+                               (User, recount_users)):
+            total = 0
+            last_id = 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('pk', flat=True)[:options['chunk_size']]
+                )
+                if not ids:
+                    break
+                total += recount(ids)
+                last_id = ids[-1]
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: пересчитано {total}'
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.load_data import LoadDataGenerator
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических пользователей, рецептов, избранного, '
+            'корзин и подписок для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для связей; на SQLite всегда 1.'
+        )
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имен и почты создаваемых пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=f"{options['prefix']}0").exists():
+            raise CommandError(
+                f"Пользователи с префиксом {options['prefix']} уже есть; "
+                f'укажите другой --prefix.'
+            )
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write('SQLite не допускает параллельной записи, '
+                              'генерация в одном процессе.')
+            workers = 1
+        generator = LoadDataGenerator(
+            options['users'], options['recipes'], options['favorites'],
+            options['carts'], options['subscriptions'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            prefix=options['prefix'], log=self.stdout.write
+        )
+        started = time.perf_counter()
+        generator.run(workers)
+        for name, count in generator.summary().items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с.'
+        ))
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+CREATE_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (name gin_trgm_ops);',
+)
+DROP_SQL = ('DROP INDEX IF EXISTS recipes_ingredient_name_trgm;',)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+POSTGRESQL_CREATE = (
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector;',
+    'CREATE INDEX recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector);',
+    '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C');
+    ''',
+)
+POSTGRESQL_DROP = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector;',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector;',
+)
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+    "name, text, ingredients, tokenize='unicode61 remove_diacritics 2');",
+    '''
+    INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients)
+    SELECT recipe.id, recipe.name, recipe.text, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), '')
+    FROM recipes_recipe AS recipe;
+    ''',
+)
+SQLITE_DROP = ('DROP TABLE IF EXISTS recipes_recipe_fts;',)
+
+
+def run_for_vendor(postgresql, sqlite):
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgresql,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_CREATE, SQLITE_CREATE),
+            run_for_vendor(POSTGRESQL_DROP, SQLITE_DROP),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count(apps.get_model('recipes', 'Favorite'),
+                              'recipe'),
+        in_carts_count=count(apps.get_model('recipes', 'ShoppingCart'),
+                             'recipe'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество в избранных'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество в корзинах'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Картинка рецепта'), ('avatar', 'Аватар')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнено'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=16, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Обработка картинки',
+                'verbose_name_plural': 'Обработка картинок',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('processing', 'Обрабатывается'), ('ready', 'Готова'), ('failed', 'Ошибка')], default='ready', editable=False, max_length=16, verbose_name='Состояние картинки'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Ссылки рецептам без них создаются при первом запросе ссылки
+    # (api.views.get_short_link): код зависит от SHORT_LINK_KEY и
+    # текущей версии recipes.shortlinks, а не от состояния на момент
+    # миграции.
+
+    dependencies = [
+        ('recipes', '0008_image_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipeshortlink',
+            name='short_link',
+            field=models.CharField(blank=True, max_length=6, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_short_link_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeshortlink',
+            name='clicks',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Переходы'),
+        ),
+    ]
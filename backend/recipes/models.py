@@ -1,8 +1,9 @@
-import uuid
-
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window)
+from django.db.models.functions import RowNumber
 
 from recipes.constants import (MAX_AMOUNT_INGREDIENT, MAX_COOKING_TIME,
                                MAX_LENGTH_MEASUREMENT_UNIT,
@@ -10,6 +11,8 @@ from recipes.constants import (MAX_AMOUNT_INGREDIENT, MAX_COOKING_TIME,
                                MAX_LENGTH_NAME_RECIPE, MAX_LENGTH_SHORT_LINK,
                                MAX_LENGTH_TAG, MAX_LENGTH_TEXT_RECIPE,
                                MIN_AMOUNT_INGREDIENT, MIN_COOKING_TIME)
+from recipes.shortlinks import encode
+from users.models import CounterFieldsMixin, Subscription
 from users.validators import validate_alfanumeric_content
 
 User = get_user_model()
@@ -38,7 +41,74 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Выборки рецептов для страниц просмотра."""
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует флаги избранного, корзины и подписки на автора
+        и подгружает теги и ингредиенты фиксированным числом запросов.
+        """
+        queryset = self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+        if user is None or user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
+
+    def previews(self, author_ids, limit=None):
+        """
+        Последние рецепты каждого автора, не больше limit на автора,
+        одним запросом с ROW_NUMBER() OVER (PARTITION BY author_id).
+        """
+        queryset = self.filter(author_id__in=author_ids).only(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time'
+        )
+        if not limit:
+            return queryset.order_by('-id')
+        sql, params = queryset.order_by().annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc()
+            )
+        ).query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) previews '
+            'WHERE recipe_rank <= %s ORDER BY id DESC',
+            (*params, limit)
+        )
+
+
+class ImageStatus(models.TextChoices):
+    PROCESSING = 'processing', 'Обрабатывается'
+    READY = 'ready', 'Готова'
+    FAILED = 'failed', 'Ошибка'
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель рецептов"""
     tags = models.ManyToManyField(
         Tag,
@@ -63,6 +133,19 @@ class Recipe(models.Model):
         null=True,
         help_text='Загрузите картинку'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    image_status = models.CharField(
+        verbose_name='Состояние картинки',
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY,
+        editable=False
+    )
     text = models.CharField(
         verbose_name='Описание',
         max_length=MAX_LENGTH_TEXT_RECIPE,
@@ -82,6 +165,20 @@ class Recipe(models.Model):
         ],
         help_text='Введите время готовки (мин.)'
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество в избранных',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Количество в корзинах',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -200,7 +297,7 @@ class ShoppingCart(FavoriteShoppingCart):
         verbose_name_plural = 'Корзина'
 
 
-class RecipeShortLink(models.Model):
+class RecipeShortLink(CounterFieldsMixin, models.Model):
     """Модель коротких ссылок на рецепты."""
     recipe = models.OneToOneField(
         Recipe,
@@ -213,12 +310,125 @@ class RecipeShortLink(models.Model):
         blank=True,
         null=True
     )
+    clicks = models.PositiveBigIntegerField(
+        verbose_name='Переходы',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('clicks',)
 
     def save(self, *args, **kwargs):
         if not self.short_link:
-            self.short_link = self.generate_short_link()
+            self.short_link = encode(self.recipe_id)
         super().save(*args, **kwargs)
 
-    def generate_short_link(self):
-        short_link = uuid.uuid4().hex[:MAX_LENGTH_SHORT_LINK]
-        return short_link
+
+class FeedEntry(models.Model):
+    """Запись ленты подписчика: рецепт автора, на которого он подписан."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} >> {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Итог ингредиента в списке покупок пользователя по всей корзине."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} >> {self.ingredient}: {self.total_amount}'
+
+
+class ImageJob(models.Model):
+    """Задание фоновой обработки загруженной картинки."""
+
+    class Kind(models.TextChoices):
+        RECIPE = 'recipe', 'Картинка рецепта'
+        AVATAR = 'avatar', 'Аватар'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнено'
+        FAILED = 'failed', 'Ошибка'
+
+    kind = models.CharField(
+        verbose_name='Тип',
+        max_length=16,
+        choices=Kind.choices
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Id объекта')
+    status = models.CharField(
+        verbose_name='Состояние',
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки',
+        default=0
+    )
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    created_at = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Изменено',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Обработка картинок'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}: {self.status}'
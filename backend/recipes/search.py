@@ -0,0 +1,111 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам."""
+import re
+import threading
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+WORD_RE = re.compile(r'\w+')
+_pending = threading.local()
+
+POSTGRESQL_UPDATE = '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+    WHERE recipe.id = ANY(%s)
+'''
+SQLITE_DELETE = 'DELETE FROM recipes_recipe_fts WHERE rowid IN ({})'
+SQLITE_INSERT = '''
+    INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients)
+    SELECT recipe.id, recipe.name, recipe.text, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), '')
+    FROM recipes_recipe AS recipe WHERE recipe.id IN ({})
+'''
+
+POSTGRESQL_MATCH = (
+    '"recipes_recipe"."search_vector" '
+    "@@ websearch_to_tsquery('russian', %s)"
+)
+POSTGRESQL_RANK = (
+    'ts_rank("recipes_recipe"."search_vector", '
+    "websearch_to_tsquery('russian', %s))"
+)
+SQLITE_MATCH = (
+    '"recipes_recipe"."id" IN (SELECT rowid FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s)'
+)
+SQLITE_RANK = (
+    '(SELECT -bm25(recipes_recipe_fts, 10.0, 1.0, 5.0) '
+    'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s '
+    'AND rowid = "recipes_recipe"."id")'
+)
+
+
+def index_recipes(recipe_ids):
+    """Пересчет поискового документа рецептов; удаленные выпадают."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRESQL_UPDATE, [recipe_ids])
+        elif connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(SQLITE_DELETE.format(placeholders), recipe_ids)
+            cursor.execute(SQLITE_INSERT.format(placeholders), recipe_ids)
+
+
+class PendingIndex:
+    """Рецепты одной транзакции; переиндексируются одним вызовом."""
+
+    def __init__(self):
+        self.ids = set()
+
+    def __call__(self):
+        index_recipes(self.ids)
+
+
+def schedule_index(recipe_ids):
+    """
+    Переиндексация после коммита, один обработчик на транзакцию.
+    При откате Django убирает обработчик из run_on_commit, и следующая
+    транзакция начинает новый набор без рецептов откаченной.
+    """
+    pending = getattr(_pending, 'index', None)
+    if pending is not None and any(
+        entry[1] is pending for entry in connection.run_on_commit
+    ):
+        pending.ids.update(recipe_ids)
+        return
+    pending = _pending.index = PendingIndex()
+    pending.ids.update(recipe_ids)
+    transaction.on_commit(pending)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности."""
+    words = WORD_RE.findall(query)
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        match, rank, param = POSTGRESQL_MATCH, POSTGRESQL_RANK, query
+    else:
+        match, rank = SQLITE_MATCH, SQLITE_RANK
+        param = ' '.join(f'"{word}"*' for word in words)
+    return queryset.annotate(
+        search_match=RawSQL(match, [param], output_field=BooleanField()),
+        search_rank=RawSQL(rank, [param], output_field=FloatField()),
+    ).filter(search_match=True).order_by('-search_rank', '-id')
@@ -0,0 +1,128 @@
+"""
+Итоги списков покупок по пользователям.
+
+Таблица ShoppingListItem меняется на разницу при добавлении рецепта
+в корзину, удалении из нее и изменении состава рецепта в корзинах.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+# Итоги пользователей изменены в обход корзины; аргумент user_ids.
+# Объявлен здесь, а не в recipes.signals: тот импортирует этот модуль.
+shopping_lists_changed = Signal()
+
+
+def recipe_amounts(recipe_id):
+    """Состав рецепта: {ingredient_id: amount}."""
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def _create_missing(user_ids, ingredient_ids):
+    """
+    Нулевые строки для недостающих пар. Конфликты игнорируются:
+    параллельная транзакция могла вставить ту же пару, и итог
+    все равно меняется следующим UPDATE с F().
+    """
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=0)
+         for user_id in user_ids for ingredient_id in ingredient_ids),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def change_cart(user_id, recipe_id, sign):
+    """Добавление (sign=1) или вычитание (sign=-1) рецепта из итогов."""
+    amounts = recipe_amounts(recipe_id)
+    if not amounts:
+        return
+    if sign > 0:
+        _create_missing([user_id], amounts)
+    ShoppingListItem.objects.filter(
+        user_id=user_id, ingredient_id__in=amounts
+    ).update(total_amount=Greatest(F('total_amount') + Case(
+        *(When(ingredient_id=ingredient_id, then=Value(sign * amount))
+          for ingredient_id, amount in amounts.items()),
+        output_field=IntegerField()
+    ), 0))
+    if sign < 0:
+        ShoppingListItem.objects.filter(
+            user_id=user_id, ingredient_id__in=amounts, total_amount=0
+        ).delete()
+
+
+@transaction.atomic
+def apply_recipe_delta(recipe_id, delta):
+    """
+    Изменение состава рецепта во всех корзинах с ним:
+    delta = {ingredient_id: новое количество - старое}.
+    """
+    delta = {pk: change for pk, change in delta.items() if change}
+    if not delta:
+        return
+    user_ids = list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    _create_missing(user_ids, [pk for pk, change in delta.items()
+                               if change > 0])
+    for ingredient_id, change in delta.items():
+        ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id=ingredient_id
+        ).update(total_amount=Greatest(F('total_amount') + change, 0))
+    ShoppingListItem.objects.filter(
+        user_id__in=user_ids, total_amount=0
+    ).delete()
+    shopping_lists_changed.send(sender=ShoppingListItem, user_ids=user_ids)
+
+
+def expected_totals(user_ids):
+    """Итоги, пересчитанные по корзинам: {(user_id, ingredient_id): сумма}."""
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user_id__in=user_ids
+        ).values_list(
+            'recipe__shopping_cart__user_id', 'ingredient_id'
+        ).order_by().annotate(total=Sum('amount'))
+    }
+
+
+def find_drift(user_ids):
+    """Расхождения таблицы с корзинами: {(user, ingredient): (было, надо)}."""
+    expected = expected_totals(user_ids)
+    stored = dict(
+        ((user_id, ingredient_id), total)
+        for user_id, ingredient_id, total in ShoppingListItem.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'ingredient_id', 'total_amount')
+    )
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Полная пересборка итогов пользователей по их корзинам."""
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=total)
+         for (user_id, ingredient_id), total
+         in expected_totals(user_ids).items()),
+        batch_size=1000
+    )
+    shopping_lists_changed.send(sender=ShoppingListItem,
+                                user_ids=list(user_ids))
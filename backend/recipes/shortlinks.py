@@ -0,0 +1,45 @@
+"""
+Короткие коды рецептов: base62 от ключевой перестановки id.
+
+Перестановка (сеть Фейстеля на 34 битах) взаимно однозначна,
+поэтому коды разных рецептов не совпадают и не идут подряд.
+"""
+import hashlib
+import hmac
+
+from django.conf import settings
+
+from recipes.constants import MAX_LENGTH_SHORT_LINK, STRING_FOR_RANDOM
+
+ALPHABET = STRING_FOR_RANDOM
+HALF_BITS = 17
+HALF_MASK = (1 << HALF_BITS) - 1
+MAX_ID = 1 << (HALF_BITS * 2)
+ROUNDS = 4
+
+
+def _round(key, number, value):
+    digest = hmac.new(
+        key, f'{number}:{value}'.encode(), hashlib.sha256
+    ).digest()
+    return int.from_bytes(digest[:4], 'big') & HALF_MASK
+
+
+def permute(value):
+    key = settings.SHORT_LINK_KEY.encode()
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for number in range(ROUNDS):
+        left, right = right, left ^ _round(key, number, right)
+    return (left << HALF_BITS) | right
+
+
+def encode(recipe_id):
+    """Код фиксированной длины MAX_LENGTH_SHORT_LINK для id рецепта."""
+    if not 0 < recipe_id < MAX_ID:
+        raise ValueError(f'Нельзя построить код для id {recipe_id}.')
+    value = permute(recipe_id)
+    chars = []
+    for _ in range(MAX_LENGTH_SHORT_LINK):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipes.counters import change_counter, recount_users
+from recipes.feed import backfill, fan_out, prune
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeShortLink, ShoppingCart, Tag)
+from recipes.search import schedule_index
+from recipes.shopping_list import change_cart
+from recipes.shortlinks import encode
+from users.models import Subscription, User
+
+# Поля рецепта, попадающие в поисковый индекс.
+SEARCH_FIELDS = {'name', 'text'}
+
+# Рецепты созданы в обход save(): пакетный импорт, генерация данных.
+recipes_imported = Signal()
+# Справочник изменен в обход save() загрузчиком; аргумент report.
+catalog_loaded = Signal()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_catalog_version(TAGS))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_catalog_version(INGREDIENTS))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCH_FIELDS & set(update_fields):
+        return
+    schedule_index([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_recipe_ingredients(sender, instance, **kwargs):
+    schedule_index([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    if created:
+        return
+    schedule_index(RecipeIngredient.objects.filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(recipes_imported)
+def count_imported_recipes(sender, recipe_ids, **kwargs):
+    recount_users(
+        Recipe.objects.filter(pk__in=recipe_ids).values('author_id')
+    )
+
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def count_added_to_list(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def count_removed_from_list(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out([instance.pk]))
+
+
+@receiver(recipes_imported)
+def fan_out_imported_recipes(sender, recipe_ids, **kwargs):
+    fan_out(recipe_ids)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_feed(sender, instance, **kwargs):
+    prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        change_cart(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    change_cart(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_short_link(sender, instance, created, **kwargs):
+    if created:
+        RecipeShortLink.objects.create(recipe=instance)
+
+
+@receiver(recipes_imported)
+def create_imported_short_links(sender, recipe_ids, **kwargs):
+    RecipeShortLink.objects.bulk_create(
+        (RecipeShortLink(recipe_id=pk, short_link=encode(pk))
+         for pk in recipe_ids),
+        ignore_conflicts=True
+    )
@@ -0,0 +1,69 @@
+from django.test import TestCase
+
+from recipes.counters import change_counter
+from recipes.models import Recipe
+from users.models import User
+
+
+class CounterSaveTests(TestCase):
+    """
+    Полное сохранение устаревшего экземпляра не затирает счетчики,
+    а присвоенные счетчики и удаленные строки сохраняются как обычно.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Авторов', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Сварить суп',
+            cooking_time=30, image='rescipes/image/soup.png'
+        )
+
+    def test_recipe_save_keeps_concurrent_increment(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        change_counter(Recipe, self.recipe.pk, 'favorites_count', 1)
+        stale.name = 'Борщ'
+        stale.save()
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.name, 'Борщ')
+
+    def test_user_save_keeps_concurrent_increment(self):
+        stale = User.objects.get(pk=self.author.pk)
+        change_counter(User, self.author.pk, 'followers_count', 1)
+        stale.set_password('new-password')
+        stale.save()
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(author.followers_count, 1)
+        self.assertTrue(author.check_password('new-password'))
+
+    def test_counter_written_when_named_in_update_fields(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.in_carts_count = 5
+        recipe.save(update_fields=['in_carts_count'])
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).in_carts_count, 5
+        )
+
+    def test_assigned_counter_written_by_plain_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.favorites_count = 7
+        recipe.save()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 7
+        )
+        change_counter(Recipe, self.recipe.pk, 'favorites_count', 1)
+        recipe.name = 'Борщ'
+        recipe.save()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).favorites_count, 8
+        )
+
+    def test_save_of_deleted_row_inserts_it(self):
+        stale = User.objects.get(pk=self.author.pk)
+        User.objects.filter(pk=self.author.pk).delete()
+        stale.save()
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
@@ -0,0 +1,53 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from recipes.jobs import _discard, claim, enqueue, run
+from recipes.models import ImageJob, ImageStatus, Recipe
+from users.models import User
+
+
+class FailedImageJobTests(TestCase):
+    """Непригодная картинка не остается в рецепте после сбоя обработки."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Авторов', password='password'
+        )
+        self.name = default_storage.save(
+            'rescipes/image/broken.png', ContentFile(b'not an image')
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Сварить суп', cooking_time=30,
+            image=self.name, image_status=ImageStatus.PROCESSING
+        )
+        enqueue(ImageJob.Kind.RECIPE, [self.recipe.pk])
+
+    def test_failed_job_clears_image(self):
+        job, = claim(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run(job), ImageJob.Status.FAILED)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.image_status, ImageStatus.FAILED)
+        self.assertFalse(recipe.image)
+        self.assertFalse(default_storage.exists(self.name))
+
+    def test_image_replaced_during_job_kept(self):
+        job, = claim(1)
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='rescipes/image/new.png'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            _discard(job, stale)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.image.name, 'rescipes/image/new.png')
+        self.assertTrue(default_storage.exists(self.name))
@@ -13,7 +13,9 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'first_name',
         'last_name',
-        'avatar_tag'
+        'avatar_tag',
+        'recipes_count',
+        'followers_count'
     )
     list_display_links = ('id', 'username',)
     search_fields = ('username', 'email')
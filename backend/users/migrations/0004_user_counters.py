@@ -0,0 +1,50 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(
+        recipes_count=count(apps.get_model('recipes', 'Recipe'), 'author'),
+        followers_count=count(Subscription, 'author'),
+        following_count=count(Subscription, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_auto_20240823_1937'),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
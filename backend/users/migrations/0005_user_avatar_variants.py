@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Уменьшенные копии аватара'),
+        ),
+    ]
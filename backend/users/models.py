@@ -5,7 +5,52 @@ from .constants import EMAIL_MAX_LENGTH, USERNAME_MAX_LENGTH
 from .validators import validate_alfanumeric_content, validate_username
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Денормализованные счетчики меняются запросами UPDATE с F().
+    save() существующей строки не пишет счетчик, который не менялся
+    с загрузки из БД: иначе устаревший экземпляр затер бы чужие
+    приращения. Присвоенный счетчик сохраняется как обычно, а save()
+    удаленной строки, как и без примеси, вставляет ее заново.
+    """
+    counter_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_counters = instance._counter_values()
+        return instance
+
+    def _counter_values(self, fields=None):
+        """Загруженные значения счетчиков, без запросов к БД."""
+        return {
+            name: self.__dict__[name] for name in self.counter_fields
+            if name in self.__dict__ and (fields is None or name in fields)
+        }
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self._loaded_counters = {
+            **getattr(self, '_loaded_counters', {}),
+            **self._counter_values(fields),
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_counters = self._counter_values()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        loaded = getattr(self, '_loaded_counters', {})
+        values = [
+            (field, model, value) for field, model, value in values
+            if field.attname not in loaded or loaded[field.attname] != value
+        ]
+        return super()._do_update(base_qs, using, pk_val, values,
+                                  update_fields, forced_update)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Модель переопределенного пользователя"""
 
     email = models.EmailField(
@@ -36,6 +81,28 @@ class User(AbstractUser):
         null=True,
         default=None
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0,
+        editable=False
+    )
+    counter_fields = ('recipes_count', 'followers_count', 'following_count')
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     USERNAME_FIELD = 'email'
 
@@ -47,6 +114,17 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Отложенные поля загружаются одним запросом. Пользователь из кэша
+        токенов (api.authentication) получает их при первом обращении.
+        """
+        if fields is not None:
+            deferred = self.get_deferred_fields()
+            if deferred.intersection(fields):
+                fields = deferred.union(fields)
+        super().refresh_from_db(using, fields)
+
 
 class Subscription(models.Model):
     """Модель подписот"""
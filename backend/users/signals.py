@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def count_subscription(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+        change_counter(User, instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def count_unsubscription(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+    change_counter(User, instance.user_id, 'following_count', -1)
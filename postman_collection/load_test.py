@@ -0,0 +1,389 @@
+"""
+Нагрузочный прогон postman-коллекции.
+
+Каждый виртуальный пользователь проходит коллекцию целиком, по порядку,
+со своим набором переменных: имена и почта получают уникальный суффикс,
+id и токены берутся из ответов так же, как это делают тест-скрипты
+коллекции (pm.collectionVariables.set). Виртуальные пользователи
+работают параллельно в пуле потоков, у каждого потока свои соединения.
+По умолчанию соединение на каждый запрос: runserver отвечает
+на keep-alive с задержкой ~40 мс. За nginx стоит включить --keepalive.
+
+Пример:
+    python load_test.py --concurrency 8 --iterations 5 --output run.json
+    python load_test.py --concurrency 8 --compare run.json
+"""
+import argparse
+import http.client
+import json
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+COLLECTION = Path(__file__).with_name('foodgram.postman_collection.json')
+PERCENTILES = (50, 95, 99)
+
+# Переменные, из-за которых параллельные прогоны мешали бы друг другу.
+USERNAME_VARIABLES = (
+    'username', 'secondUserUsername', 'thirdUserUsername'
+)
+EMAIL_VARIABLES = ('email', 'secondUserEmail', 'thirdUserEmail')
+
+VARIABLE_RE = re.compile(r'{{(\w+)}}')
+LOCAL_RE = re.compile(
+    r'''(?:const|let|var)\s+(\w+)\s*=\s*_\.get\(\s*responseData\s*,'''
+    r'''\s*["']([\w.\[\]]+)["']\s*\)'''
+)
+SET_RE = re.compile(
+    r'''pm\.collectionVariables\.set\(\s*["'](\w+)["']\s*,\s*'''
+    r'''([\w.\[\]]+(?:\.slice\(\s*\d+\s*,\s*\d+\s*\))?)\s*\)'''
+)
+ACCESSOR_RE = re.compile(
+    r'\[(\d+)\]|\.slice\(\s*(\d+)\s*,\s*(\d+)\s*\)|\.?(\w+)'
+)
+
+
+def evaluate(expression, data):
+    """Значение выражения вида responseData[0].name.slice(0,1)."""
+    value = data
+    for index, start, end, key in ACCESSOR_RE.findall(expression):
+        if index:
+            value = value[int(index)]
+        elif start:
+            value = value[int(start):int(end)]
+        else:
+            value = value[key]
+    return value
+
+
+def extractors(item):
+    """Переменные, которые тест-скрипт запроса берет из ответа."""
+    script = '\n'.join(
+        '\n'.join(event['script'].get('exec', []))
+        for event in item.get('event', [])
+        if event.get('listen') == 'test'
+    )
+    local = dict(LOCAL_RE.findall(script))
+    result = []
+    for name, expression in SET_RE.findall(script):
+        if expression in local:
+            expression = 'responseData.' + local[expression]
+        if expression.startswith('responseData'):
+            result.append((name, expression[len('responseData'):]))
+    return result
+
+
+def auth_header(auth):
+    """Заголовок из авторизации apikey; None, если авторизации нет."""
+    if not auth or auth.get('type') != 'apikey':
+        return None
+    options = {entry['key']: entry['value'] for entry in auth['apikey']}
+    return options.get('key', 'Authorization'), options.get('value', '')
+
+
+def flatten(items, path=(), auth=None):
+    """Запросы коллекции по порядку с унаследованной авторизацией."""
+    for item in items:
+        item_auth = item.get('auth', auth)
+        if 'item' in item:
+            yield from flatten(item['item'], path + (item['name'],),
+                               item_auth)
+            continue
+        request = item['request']
+        url = request['url']
+        yield {
+            'name': '/'.join(path + (item['name'].strip(),)),
+            'method': request['method'],
+            'url': url['raw'] if isinstance(url, dict) else url,
+            'headers': [
+                (header['key'], header['value'])
+                for header in request.get('header', [])
+                if not header.get('disabled')
+            ],
+            'auth': auth_header(request.get('auth', item_auth)),
+            'body': (request.get('body') or {}).get('raw') or None,
+            'extract': extractors(item),
+        }
+
+
+def load_collection(path):
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])
+    }
+    return list(flatten(collection['item'], auth=collection.get('auth'))), \
+        variables
+
+
+def personalize(variables, tag):
+    """Уникальные имена и почта виртуального пользователя."""
+    variables = dict(variables)
+    for name in USERNAME_VARIABLES:
+        variables[name] = json.dumps(f'{json.loads(variables[name])}-{tag}')
+    for name in EMAIL_VARIABLES:
+        local, domain = json.loads(variables[name]).split('@', 1)
+        variables[name] = json.dumps(f'{local}.{tag}@{domain}')
+    return variables
+
+
+def resolve(value, variables):
+    return VARIABLE_RE.sub(
+        lambda match: str(variables.get(match[1], match[0])), value
+    )
+
+
+class NoDelayMixin:
+    """
+    Без алгоритма Нейгла: иначе заголовки и тело уходят разными
+    пакетами и задержанный ACK добавляет к каждому запросу ~40 мс.
+    """
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class HTTPConnection(NoDelayMixin, http.client.HTTPConnection):
+    pass
+
+
+class HTTPSConnection(NoDelayMixin, http.client.HTTPSConnection):
+    pass
+
+
+class Client:
+    """Соединения потока с серверами коллекции."""
+
+    def __init__(self, timeout, keepalive=False):
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.connections = {}
+
+    def request(self, method, url, headers, body):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = quote(parts.path, safe='/%')
+        if parts.query:
+            path += '?' + quote(parts.query, safe='=&%+')
+        for attempt in (1, 2):
+            connection = self.connections.get(key)
+            if connection is None:
+                factory = (HTTPSConnection if parts.scheme == 'https'
+                           else HTTPConnection)
+                connection = self.connections[key] = factory(
+                    parts.netloc, timeout=self.timeout
+                )
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                content = response.read()
+                if not self.keepalive:
+                    connection.close()
+                    del self.connections[key]
+                return response.status, content
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                del self.connections[key]
+                # Сервер мог закрыть простаивающее соединение.
+                if attempt == 2 or not self.keepalive:
+                    raise
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+
+
+class LoadTest:
+
+    def __init__(self, requests, variables, base_url=None, timeout=30,
+                 keepalive=False):
+        self.requests = requests
+        self.keepalive = keepalive
+        self.variables = dict(variables)
+        if base_url:
+            self.variables['baseUrl'] = base_url.rstrip('/')
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:6]
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, name, elapsed, status):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+
+    def virtual_user(self, number, iterations):
+        client = Client(self.timeout, self.keepalive)
+        try:
+            for iteration in range(iterations):
+                self.replay(client, personalize(
+                    self.variables, f'{self.run_id}{number}x{iteration}'
+                ))
+        finally:
+            client.close()
+
+    def replay(self, client, variables):
+        """Один проход коллекции с цепочкой переменных из ответов."""
+        for request in self.requests:
+            headers = {
+                key: resolve(value, variables)
+                for key, value in request['headers']
+            }
+            if request['auth']:
+                key, value = request['auth']
+                headers[key] = resolve(value, variables)
+            body = request['body']
+            if body is not None:
+                body = resolve(body, variables).encode('utf-8')
+                headers.setdefault('Content-Type', 'application/json')
+            started = time.perf_counter()
+            try:
+                status, content = client.request(
+                    request['method'], resolve(request['url'], variables),
+                    headers, body
+                )
+            except (http.client.HTTPException, OSError) as error:
+                self.record(request['name'], time.perf_counter() - started,
+                            type(error).__name__)
+                continue
+            self.record(request['name'], time.perf_counter() - started,
+                        status)
+            if request['extract'] and status < 400:
+                try:
+                    data = json.loads(content)
+                except ValueError:
+                    continue
+                for name, expression in request['extract']:
+                    try:
+                        variables[name] = evaluate(expression, data)
+                    except (IndexError, KeyError, TypeError):
+                        pass
+
+    def run(self, concurrency, iterations):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for future in [pool.submit(self.virtual_user, number, iterations)
+                           for number in range(concurrency)]:
+                future.result()
+        return self.report(time.perf_counter() - started, concurrency,
+                           iterations)
+
+    def report(self, duration, concurrency, iterations):
+        requests = {}
+        for name in (request['name'] for request in self.requests):
+            if name in requests or name not in self.latencies:
+                continue
+            latencies = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            requests[name] = {
+                'count': len(latencies),
+                'errors': sum(
+                    count for status, count in statuses.items()
+                    if not isinstance(status, int) or status >= 500
+                ),
+                'statuses': {
+                    str(status): count for status, count in statuses.items()
+                },
+                'throughput_rps': round(len(latencies) / duration, 2),
+                'mean_ms': round(
+                    sum(latencies) / len(latencies) * 1000, 2
+                ),
+                'max_ms': round(latencies[-1] * 1000, 2),
+                **{
+                    f'p{percentile}_ms': round(
+                        percentile_of(latencies, percentile) * 1000, 2
+                    )
+                    for percentile in PERCENTILES
+                },
+            }
+        total = sum(entry['count'] for entry in requests.values())
+        return {
+            'meta': {
+                'base_url': self.variables['baseUrl'],
+                'concurrency': concurrency,
+                'iterations': iterations,
+                'duration_s': round(duration, 3),
+                'requests': total,
+                'errors': sum(
+                    entry['errors'] for entry in requests.values()
+                ),
+                'throughput_rps': round(total / duration, 2),
+            },
+            'requests': requests,
+        }
+
+
+def percentile_of(values, percentile):
+    """Перцентиль по ближайшему рангу отсортированного списка."""
+    rank = max(int(-(-percentile * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+def print_report(report, previous=None, out=sys.stdout):
+    previous = (previous or {}).get('requests', {})
+    meta = report['meta']
+    out.write(
+        f"{meta['requests']} запросов за {meta['duration_s']} с, "
+        f"{meta['throughput_rps']} rps, ошибок: {meta['errors']}\n"
+    )
+    columns = ''.join(f'{f"p{p}":>18}' for p in PERCENTILES)
+    out.write(f"{'запрос':<72}{'rps':>8}{columns}\n")
+    for name, entry in report['requests'].items():
+        line = f"{name[:71]:<72}{entry['throughput_rps']:>8.1f}"
+        for percentile in PERCENTILES:
+            key = f'p{percentile}_ms'
+            value = f'{entry[key]:.1f}'
+            if name in previous:
+                delta = entry[key] - previous[name][key]
+                value += f' ({delta:+.1f})'
+            line += f'{value:>18}'
+        out.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный прогон postman-коллекции Foodgram.'
+    )
+    parser.add_argument('--collection', default=COLLECTION)
+    parser.add_argument('--base-url',
+                        help='Адрес сервера вместо переменной baseUrl.')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Число параллельных виртуальных пользователей.')
+    parser.add_argument('--iterations', type=int, default=1,
+                        help='Проходов коллекции на пользователя.')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--keepalive', action='store_true',
+                        help='Переиспользовать соединения между запросами.')
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    parser.add_argument('--compare',
+                        help='JSON предыдущего прогона для сравнения.')
+    options = parser.parse_args(argv)
+
+    requests, variables = load_collection(options.collection)
+    test = LoadTest(requests, variables, options.base_url, options.timeout,
+                    options.keepalive)
+    report = test.run(options.concurrency, options.iterations)
+    previous = None
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as file:
+            previous = json.load(file)
+    print_report(report, previous)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+    return 1 if report['meta']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())